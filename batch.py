@@ -0,0 +1,318 @@
+"""
+The part of the project that evaluates large numbers of independent positions at once, for offline analysis. The
+positions are packed into a (N, 12) array of uint64 bitboards (one per piece code, same square layout as the BitBoard
+class) and every feature is computed for all of them with vectorized NumPy operations, without any Python loop over
+the positions or the squares:
+
+    python batch.py positions.fen scores.npy
+    python batch.py positions.fen scores.npy --chunk-size 100000
+
+The result is a structured array (see FEATURES) that np.save writes straight to disk and np.load reads back.
+"""
+# region imports
+import argparse
+import time
+
+import numpy as np
+
+import common
+from bitboard import WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, NO_PIECE, DIRECTIONS, ROOK_DIRECTIONS, \
+    BISHOP_DIRECTIONS
+from board import FEN_SYMBOLS, parse_fen
+from evaluation import MATERIAL_SCORES, SQUARE_SCORES
+# endregion imports
+
+
+# region constants
+# one record per position, little-endian so that the files read the same on every machine
+FEATURES = np.dtype([
+    ("color", "u1"),  # the player to move (WHITE or BLACK)
+    ("material", "<i4"),  # material balance in centipawns, from White's point of view
+    ("positional", "<i4"),  # piece-square balance in centipawns, from White's point of view
+    ("mobility", "<i2", (2,)),  # squares reached by the pieces of each color (see mobility)
+    ("attacks", "<u8", (2,))  # squares attacked by each color
+])
+
+FILES = tuple(np.uint64(0x0101010101010101 << col) for col in range(common.DIMENSION))
+
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+PAWN_OFFSETS = (((-1, -1), (-1, 1)),  # white pawns move towards row 0
+                ((1, -1), (1, 1)))
+
+# weights of the 12 x 64 square bits of a position: the material and piece-square scores, negated for Black
+MATERIAL_WEIGHTS = np.array([MATERIAL_SCORES[code] * (1 if code < 6 else -1) for code in range(NO_PIECE)],
+                            dtype=np.int32)
+SQUARE_WEIGHTS = np.array([[score * (1 if code < 6 else -1) for score in SQUARE_SCORES[code]]
+                           for code in range(NO_PIECE)], dtype=np.int32).reshape(-1)
+
+# piece placement of a FEN string -> one character per square ("." for the empty ones) -> piece code
+FEN_EXPANSION = [(str(count).encode(), b"." * count) for count in range(1, 9)]
+FEN_RANK_SIZE = common.DIMENSION + 1  # the squares of a rank and the "/" that ends it
+FEN_CODE_TABLE = np.full(256, 255, dtype=np.uint8)
+FEN_CODE_TABLE[ord(".")] = NO_PIECE
+for (code, symbol) in enumerate(FEN_SYMBOLS):
+    FEN_CODE_TABLE[ord(symbol)] = code
+FEN_COLOR_CODES = {"w": WHITE, "b": BLACK}
+
+DEFAULT_CHUNK_SIZE = 65536  # positions evaluated together by the command line tool
+# endregion constants
+
+
+# region packing
+def pack_boards(boards):
+    """
+    This function packs board instances into bitboard arrays
+
+    :param boards: (Iterable[Board]) The positions
+    :return: (numpy.ndarray, numpy.ndarray) The (N, 12) uint64 bitboards and the (N,) colors to move
+    """
+    boards = list(boards)
+    pieces = np.array([board.bitboard.pieces for board in boards], dtype=np.uint64).reshape(len(boards), NO_PIECE)
+    colors = np.array([board.bitboard.color for board in boards], dtype=np.uint8)
+    return pieces, colors
+
+
+def pack_fens(fens):
+    """
+    This function packs FEN strings into bitboard arrays, without building any board. The piece placements are
+    expanded to one character per square and translated to piece codes all at once; only when a rank does not add up
+    to 8 squares (an invalid FEN) are the positions parsed one by one, to report the faulty one.
+
+    :param fens: (Iterable[String]) The positions in Forsyth-Edwards Notation
+    :return: (numpy.ndarray, numpy.ndarray) The (N, 12) uint64 bitboards and the (N,) colors to move
+    """
+    fens = list(fens)
+    fields = [fen.split(None, 2) for fen in fens]
+    placements = "".join((field[0] if field else "") + "/" for field in fields).encode("ascii", "replace")
+    for (digit, empty_squares) in FEN_EXPANSION:
+        placements = placements.replace(digit, empty_squares)
+    characters = np.frombuffer(placements, dtype=np.uint8)
+    colors = np.array([FEN_COLOR_CODES.get(field[1], 255) if len(field) > 1 else 255 for field in fields],
+                      dtype=np.uint8)
+
+    # every position has to expand to exactly 8 ranks of 8 squares, each ended by a "/"
+    valid = len(characters) == FEN_RANK_SIZE * common.DIMENSION * len(fields)
+    if valid:
+        ranks = characters.reshape(len(fields), common.DIMENSION, FEN_RANK_SIZE)
+        codes = FEN_CODE_TABLE[ranks[:, :, :common.DIMENSION]]
+        valid = (ranks[:, :, common.DIMENSION] == ord("/")).all() and not (codes == 255).any()
+    if not valid or (colors == 255).any():
+        for fen in fens:
+            parse_fen(fen)  # raises ValueError on the first invalid position
+        raise ValueError("Invalid FEN")
+
+    planes = codes.reshape(len(fields), 1, 64) == np.arange(NO_PIECE, dtype=np.uint8).reshape(1, NO_PIECE, 1)
+    pieces = np.packbits(planes, axis=2, bitorder="little").view("<u8")  # square 0 is the lowest bit
+    return pieces.reshape(len(fields), NO_PIECE).astype(np.uint64), colors
+
+
+def unpack_squares(pieces):
+    """
+    This function expands bitboards into one boolean per square
+
+    :param pieces: (numpy.ndarray) The (N, 12) uint64 bitboards
+    :return: (numpy.ndarray) The (N, 12, 8, 8) uint8 planes, indexed by [position][code][row][col]
+    """
+    data = np.ascontiguousarray(pieces, dtype="<u8").view(np.uint8)  # square 0 is the lowest bit of the first byte
+    return np.unpackbits(data, axis=1, bitorder="little").reshape(len(pieces), NO_PIECE, 8, 8)
+# endregion packing
+
+
+# region features
+def popcount(masks):
+    """
+    This function counts the set bits of every mask
+
+    :param masks: (numpy.ndarray) The uint64 masks
+    :return: (numpy.ndarray) The counts, with the same shape
+    """
+    if hasattr(np, "bitwise_count"):  # NumPy 2
+        return np.bitwise_count(masks)
+
+    data = np.ascontiguousarray(masks, dtype="<u8").view(np.uint8).reshape(masks.shape + (8,))
+    return np.unpackbits(data, axis=-1).sum(axis=-1)
+
+
+def shift(masks, offset):
+    """
+    This function moves every square of the masks by a (row, col) offset, dropping the squares that leave the board
+
+    :param masks: (numpy.ndarray) The uint64 masks
+    :param offset: (Integer, Integer) The row and column offset
+    :return: (numpy.ndarray) The shifted masks
+    """
+    (d_row, d_col) = offset
+    amount = d_row * common.DIMENSION + d_col
+    masks = masks << np.uint64(amount) if amount > 0 else masks >> np.uint64(-amount)
+
+    # a square that went past the edge of the board wraps to the other side of a neighbouring row: remove it
+    for col in range(abs(d_col)):
+        masks = masks & ~(FILES[col] if d_col > 0 else FILES[common.DIMENSION - 1 - col])
+    return masks
+
+
+def leaper_attacks(masks, offsets):
+    """
+    This function computes the squares attacked by pieces that jump by fixed offsets (Knights, Kings, Pawns)
+
+    :param masks: (numpy.ndarray) The uint64 masks of the pieces
+    :param offsets: (Iterable[(Integer, Integer)]) The (row, col) offsets of the pieces
+    :return: (numpy.ndarray) The attacked squares
+    """
+    attacks = np.zeros_like(masks)
+    for offset in offsets:
+        attacks |= shift(masks, offset)
+    return attacks
+
+
+def slider_attacks(masks, empty, directions):
+    """
+    This function computes the squares attacked by sliding pieces: every ray goes on until it hits a piece (the piece
+    itself is attacked)
+
+    :param masks: (numpy.ndarray) The uint64 masks of the pieces
+    :param empty: (numpy.ndarray) The uint64 masks of the empty squares
+    :param directions: (Iterable[Integer]) The indexes of the directions (see bitboard.DIRECTIONS)
+    :return: (numpy.ndarray) The attacked squares
+    """
+    attacks = np.zeros_like(masks)
+    for direction in directions:
+        ray = shift(masks, DIRECTIONS[direction])
+        for _ in range(common.DIMENSION - 1):
+            attacks |= ray
+            ray = shift(ray & empty, DIRECTIONS[direction])
+    return attacks
+
+
+def piece_attacks(pieces):
+    """
+    This function computes the squares attacked by every kind of piece of every position
+
+    :param pieces: (numpy.ndarray) The (N, 12) uint64 bitboards
+    :return: (numpy.ndarray) The (N, 12) uint64 attack masks, indexed by piece code
+    """
+    empty = ~np.bitwise_or.reduce(pieces, axis=1)
+    attacks = np.zeros_like(pieces)
+    for color in (WHITE, BLACK):
+        base = color * 6
+        attacks[:, base + PAWN] = leaper_attacks(pieces[:, base + PAWN], PAWN_OFFSETS[color])
+        attacks[:, base + KNIGHT] = leaper_attacks(pieces[:, base + KNIGHT], KNIGHT_OFFSETS)
+        attacks[:, base + BISHOP] = slider_attacks(pieces[:, base + BISHOP], empty, BISHOP_DIRECTIONS)
+        attacks[:, base + ROOK] = slider_attacks(pieces[:, base + ROOK], empty, ROOK_DIRECTIONS)
+        attacks[:, base + QUEEN] = slider_attacks(pieces[:, base + QUEEN], empty, ROOK_DIRECTIONS + BISHOP_DIRECTIONS)
+        attacks[:, base + KING] = leaper_attacks(pieces[:, base + KING], KING_OFFSETS)
+    return attacks
+
+
+def mobility(pieces, attacks):
+    """
+    This function approximates the mobility of each color: for every kind of piece but the Pawns, the number of
+    squares its pieces attack that are not taken by a piece of their own color. A square reached by two pieces of the
+    same kind counts once, and pins and checks are ignored.
+
+    :param pieces: (numpy.ndarray) The (N, 12) uint64 bitboards
+    :param attacks: (numpy.ndarray) The (N, 12) uint64 attack masks (see piece_attacks)
+    :return: (numpy.ndarray) The (N, 2) mobility of White and Black
+    """
+    result = np.zeros((len(pieces), 2), dtype=np.int16)
+    for color in (WHITE, BLACK):
+        own = np.bitwise_or.reduce(pieces[:, color * 6:color * 6 + 6], axis=1)
+        reached = attacks[:, color * 6 + KNIGHT:color * 6 + 6] & ~own[:, None]
+        result[:, color] = popcount(reached).sum(axis=1)
+    return result
+
+
+def evaluate_batch(pieces, colors):
+    """
+    This function computes the features of packed positions (see FEATURES)
+
+    :param pieces: (numpy.ndarray) The (N, 12) uint64 bitboards (see pack_boards and pack_fens)
+    :param colors: (numpy.ndarray) The (N,) colors to move
+    :return: (numpy.ndarray) The (N,) records
+    """
+    result = np.zeros(len(pieces), dtype=FEATURES)
+    result["color"] = colors
+    result["material"] = popcount(pieces).astype(np.int32) @ MATERIAL_WEIGHTS
+    result["positional"] = unpack_squares(pieces).reshape(len(pieces), NO_PIECE * 64).astype(np.int32) @ SQUARE_WEIGHTS
+
+    attacks = piece_attacks(pieces)
+    result["mobility"] = mobility(pieces, attacks)
+    result["attacks"][:, WHITE] = np.bitwise_or.reduce(attacks[:, :6], axis=1)
+    result["attacks"][:, BLACK] = np.bitwise_or.reduce(attacks[:, 6:], axis=1)
+    return result
+
+
+def evaluate_boards(boards):
+    """
+    This function computes the features of board instances
+
+    :param boards: (Iterable[Board]) The positions
+    :return: (numpy.ndarray) The (N,) records (see FEATURES)
+    """
+    return evaluate_batch(*pack_boards(boards))
+
+
+def evaluate_fens(fens):
+    """
+    This function computes the features of FEN strings
+
+    :param fens: (Iterable[String]) The positions in Forsyth-Edwards Notation
+    :return: (numpy.ndarray) The (N,) records (see FEATURES)
+    """
+    return evaluate_batch(*pack_fens(fens))
+# endregion features
+
+
+# region main
+def evaluate_file(fen_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    This function evaluates a file of FEN strings (one per line) chunk by chunk, straight into a memory-mapped .npy
+    file, so the memory used does not grow with the number of positions
+
+    :param fen_path: (String) The path of the FEN file
+    :param output_path: (String) The path of the .npy file to write
+    :param chunk_size: (Integer) The number of positions evaluated together
+    :return: (Integer) The number of positions
+    """
+    with open(fen_path) as file:
+        count = sum(1 for line in file if line.strip())
+
+    output = np.lib.format.open_memmap(output_path, mode="w+", dtype=FEATURES, shape=(count,))
+    (start, chunk) = (0, [])
+    with open(fen_path) as file:
+        for line in file:
+            if line.strip():
+                chunk.append(line)
+            if len(chunk) == chunk_size:
+                output[start:start + len(chunk)] = evaluate_fens(chunk)
+                (start, chunk) = (start + len(chunk), [])
+        if chunk:
+            output[start:start + len(chunk)] = evaluate_fens(chunk)
+
+    output.flush()
+    return count
+
+
+def main():
+    """
+    This method parses the command line and evaluates a file of positions
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Evaluate a file of FEN positions with NumPy")
+    parser.add_argument("fens", help="file with one FEN position per line")
+    parser.add_argument("output", help=".npy file to write")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="positions evaluated together (default: %d)" % DEFAULT_CHUNK_SIZE)
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    count = evaluate_file(arguments.fens, arguments.output, arguments.chunk_size)
+    elapsed = time.perf_counter() - start
+    print("%d positions in %.2fs (%d positions/s)" % (count, elapsed, count / elapsed if elapsed else 0))
+
+
+if __name__ == "__main__":
+    main()
+# endregion main
@@ -0,0 +1,689 @@
+"""
+The part of the project that deals with the bitboard representation of the chessboard
+"""
+# region imports
+import random
+
+import common
+# endregion imports
+
+
+# region constants
+WHITE = 0
+BLACK = 1
+COLORS = ("white", "black")
+COLOR_INDEX = {
+    "white": WHITE,
+    "black": BLACK
+}
+
+PAWN = 0
+KNIGHT = 1
+BISHOP = 2
+ROOK = 3
+QUEEN = 4
+KING = 5
+PIECE_NAMES = ("Pawn", "Knight", "Bishop", "Rook", "Queen", "King")
+PIECE_INDEX = {name: index for (index, name) in enumerate(PIECE_NAMES)}
+
+NO_PIECE = 12
+FULL = 0xFFFFFFFFFFFFFFFF
+
+CASTLE_WHITE_KING = 1
+CASTLE_WHITE_QUEEN = 2
+CASTLE_BLACK_KING = 4
+CASTLE_BLACK_QUEEN = 8
+
+# square index = row * 8 + col, row 0 being the black back rank (same layout as Board.board_inst)
+POSITIONS = tuple((square // common.DIMENSION, square % common.DIMENSION) for square in range(64))
+BITS = tuple(1 << square for square in range(64))
+
+NORTH, SOUTH, EAST, WEST, NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST = range(8)
+DIRECTIONS = ((-1, 0), (1, 0), (0, 1), (0, -1), (-1, 1), (-1, -1), (1, 1), (1, -1))
+ROOK_DIRECTIONS = (NORTH, SOUTH, EAST, WEST)
+BISHOP_DIRECTIONS = (NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST)
+# directions whose squares have increasing indexes (the nearest blocker is the lowest set bit)
+POSITIVE_DIRECTIONS = (False, True, True, False, False, False, True, True)
+# endregion constants
+
+
+# region tables
+def square(row, col):
+    """
+    This function converts a (row, col) position into a square index
+
+    :param row: (Integer) The row of the square
+    :param col: (Integer) The column of the square
+    :return: (Integer) The square index
+    """
+    return row * common.DIMENSION + col
+
+
+def iter_bits(mask):
+    """
+    This function iterates over the square indexes of all the bits that are set in a bitboard
+
+    :param mask: (Integer) The bitboard
+    :return: (Generator) The square indexes, in increasing order
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def popcount(mask):
+    """
+    This function counts the bits that are set in a bitboard
+
+    :param mask: (Integer) The bitboard
+    :return: (Integer) The number of set bits
+    """
+    return bin(mask).count("1")
+
+
+def _leaper_table(offsets):
+    """
+    This function builds the attack masks of a piece that jumps by fixed offsets (Knight, King)
+
+    :param offsets: (List[(Integer, Integer)]) The (row, col) offsets of the piece
+    :return: (Tuple[Integer]) One attack mask per square
+    """
+    table = []
+    for (row, col) in POSITIONS:
+        mask = 0
+        for (d_row, d_col) in offsets:
+            (x, y) = (row + d_row, col + d_col)
+            if 0 <= x < common.DIMENSION and 0 <= y < common.DIMENSION:
+                mask |= BITS[square(x, y)]
+        table.append(mask)
+    return tuple(table)
+
+
+def _ray_table():
+    """
+    This function builds the ray masks of every direction, starting from every square (the square itself excluded)
+
+    :return: (Tuple[Tuple[Integer]]) The ray masks, indexed by [direction][square]
+    """
+    table = []
+    for (d_row, d_col) in DIRECTIONS:
+        rays = []
+        for (row, col) in POSITIONS:
+            mask = 0
+            (x, y) = (row + d_row, col + d_col)
+            while 0 <= x < common.DIMENSION and 0 <= y < common.DIMENSION:
+                mask |= BITS[square(x, y)]
+                (x, y) = (x + d_row, y + d_col)
+            rays.append(mask)
+        table.append(tuple(rays))
+    return tuple(table)
+
+
+KNIGHT_ATTACKS = _leaper_table([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = _leaper_table([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+PAWN_ATTACKS = (_leaper_table([(-1, -1), (-1, 1)]),  # white pawns move towards row 0
+                _leaper_table([(1, -1), (1, 1)]))
+RAYS = _ray_table()
+
+
+def _between_table():
+    """
+    This function builds the masks of the squares lying strictly between two aligned squares
+
+    :return: (Tuple[Tuple[Integer]]) The masks, indexed by [square][square] (0 if the squares are not aligned)
+    """
+    table = [[0] * 64 for _ in range(64)]
+    for direction in range(len(DIRECTIONS)):
+        for first in range(64):
+            for second in iter_bits(RAYS[direction][first]):
+                table[first][second] = RAYS[direction][first] ^ RAYS[direction][second] ^ BITS[second]
+    return tuple(tuple(row) for row in table)
+
+
+BETWEEN = _between_table()
+
+# castling rights that survive a move from or to each square
+CASTLING_MASKS = [CASTLE_WHITE_KING | CASTLE_WHITE_QUEEN | CASTLE_BLACK_KING | CASTLE_BLACK_QUEEN] * 64
+CASTLING_MASKS[square(0, 0)] ^= CASTLE_BLACK_QUEEN
+CASTLING_MASKS[square(0, 4)] ^= CASTLE_BLACK_KING | CASTLE_BLACK_QUEEN
+CASTLING_MASKS[square(0, 7)] ^= CASTLE_BLACK_KING
+CASTLING_MASKS[square(7, 0)] ^= CASTLE_WHITE_QUEEN
+CASTLING_MASKS[square(7, 4)] ^= CASTLE_WHITE_KING | CASTLE_WHITE_QUEEN
+CASTLING_MASKS[square(7, 7)] ^= CASTLE_WHITE_KING
+CASTLING_MASKS = tuple(CASTLING_MASKS)
+
+
+def en_passant_pawn(en_passant):
+    """
+    This function returns the square of the Pawn that can be captured en passant
+
+    :param en_passant: (Integer) The en passant square (the square the Pawn skipped over)
+    :return: (Integer) The square of the Pawn
+    """
+    return en_passant - 8 if en_passant // common.DIMENSION == 5 else en_passant + 8
+# endregion tables
+
+
+# region zobrist
+def _zobrist_keys(count, generator):
+    """
+    This function draws random 64-bit Zobrist keys
+
+    :param count: (Integer) The number of keys
+    :param generator: (random.Random) The seeded random number generator
+    :return: (Tuple[Integer]) The keys
+    """
+    return tuple(generator.getrandbits(64) for _ in range(count))
+
+
+# a fixed seed keeps the keys (and everything stored on disk under them) identical between runs
+_zobrist_generator = random.Random(0x5EED)
+ZOBRIST_PIECES = tuple(_zobrist_keys(64, _zobrist_generator) for _ in range(12))
+ZOBRIST_CASTLING = _zobrist_keys(16, _zobrist_generator)
+ZOBRIST_EN_PASSANT = _zobrist_keys(common.DIMENSION, _zobrist_generator)
+ZOBRIST_BLACK = _zobrist_generator.getrandbits(64)
+# endregion zobrist
+
+
+# region attacks
+def slider_attacks(sq, occupancy, directions):
+    """
+    This function computes the squares attacked by a sliding piece, stopping at the first blocker of every ray
+
+    :param sq: (Integer) The square of the sliding piece
+    :param occupancy: (Integer) The bitboard of all the occupied squares
+    :param directions: (Tuple[Integer]) The directions in which the piece slides
+    :return: (Integer) The attack mask
+    """
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][sq]
+        blockers = ray & occupancy
+        if blockers:
+            if POSITIVE_DIRECTIONS[direction]:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAYS[direction][blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupancy):
+    """
+    This function computes the squares attacked by a Rook
+
+    :param sq: (Integer) The square of the Rook
+    :param occupancy: (Integer) The bitboard of all the occupied squares
+    :return: (Integer) The attack mask
+    """
+    return slider_attacks(sq, occupancy, ROOK_DIRECTIONS)
+
+
+def bishop_attacks(sq, occupancy):
+    """
+    This function computes the squares attacked by a Bishop
+
+    :param sq: (Integer) The square of the Bishop
+    :param occupancy: (Integer) The bitboard of all the occupied squares
+    :return: (Integer) The attack mask
+    """
+    return slider_attacks(sq, occupancy, BISHOP_DIRECTIONS)
+
+
+def piece_attacks(code, sq, occupancy):
+    """
+    This function computes the squares attacked by any chess piece
+
+    :param code: (Integer) The piece code (color * 6 + piece type)
+    :param sq: (Integer) The square of the chess piece
+    :param occupancy: (Integer) The bitboard of all the occupied squares
+    :return: (Integer) The attack mask
+    """
+    piece_type = code % 6
+    if piece_type == PAWN:
+        return PAWN_ATTACKS[code // 6][sq]
+    if piece_type == KNIGHT:
+        return KNIGHT_ATTACKS[sq]
+    if piece_type == BISHOP:
+        return slider_attacks(sq, occupancy, BISHOP_DIRECTIONS)
+    if piece_type == ROOK:
+        return slider_attacks(sq, occupancy, ROOK_DIRECTIONS)
+    if piece_type == QUEEN:
+        return slider_attacks(sq, occupancy, ROOK_DIRECTIONS) | slider_attacks(sq, occupancy, BISHOP_DIRECTIONS)
+    return KING_ATTACKS[sq]
+# endregion attacks
+
+
+# region BitBoard
+class BitBoard(object):
+    def __init__(self):
+        self.pieces = [0] * 12
+        self.occupancy = [0, 0]
+        self.squares = [NO_PIECE] * 64
+
+        # attack maps: the squares attacked by the piece on every square and by each color. They are brought up to
+        # date lazily, only for the pieces whose attacks go through a square that changed since the last query
+        self.attacks = [0] * 64
+        self.attack_maps = [0, 0]
+        self.changed_squares = 0
+
+        self.color = WHITE
+        self.castling = 0
+        self.en_passant = None
+
+        # Zobrist key of the position, updated with XORs by every setter below
+        self.key = ZOBRIST_CASTLING[0]
+
+    @classmethod
+    def from_board_inst(cls, board_inst, current_color):
+        """
+        This method builds the bitboard representation of a board instance
+
+        :param board_inst: (Dict{8, 8}) The current state of the chess pieces on the board
+        :param current_color: (String) The color of the player to move
+        :return: (BitBoard) The bitboard representation
+        """
+        bitboard = cls()
+        bitboard.set_color(COLOR_INDEX[current_color])
+
+        for (sq, (row, col)) in enumerate(POSITIONS):
+            piece = board_inst[row, col]
+            code = piece.code
+            if code == NO_PIECE:
+                continue
+
+            bitboard.set_square(sq, code)
+            if code % 6 == PAWN and code // 6 != bitboard.color and piece.initial_move is True:
+                bitboard.set_en_passant(sq + 8 if code // 6 == WHITE else sq - 8)  # the square behind the Pawn
+
+        castling = 0
+        for (row, rights) in [(7, (CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN)),
+                              (0, (CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN))]:
+            king = board_inst[row, 4]
+            if king.name != "King" or king.color != COLORS[row == 0] or king.has_been_moved is True:
+                continue
+
+            for (col, right) in [(7, rights[0]), (0, rights[1])]:
+                rook = board_inst[row, col]
+                if rook.name == "Rook" and rook.color == king.color and rook.has_been_moved is False:
+                    castling |= right
+        bitboard.set_castling(castling)
+
+        return bitboard
+
+    def set_square(self, sq, code):
+        """
+        This method replaces the content of a square
+
+        :param sq: (Integer) The square index
+        :param code: (Integer) The code of the new piece (NO_PIECE to empty the square)
+        :return: None
+        """
+        bit = BITS[sq]
+        self.changed_squares |= bit
+        previous = self.squares[sq]
+        if previous != NO_PIECE:
+            self.pieces[previous] ^= bit
+            self.occupancy[previous // 6] ^= bit
+            self.key ^= ZOBRIST_PIECES[previous][sq]
+
+        self.squares[sq] = code
+        if code != NO_PIECE:
+            self.pieces[code] |= bit
+            self.occupancy[code // 6] |= bit
+            self.key ^= ZOBRIST_PIECES[code][sq]
+
+    def set_color(self, color):
+        """
+        This method sets the side to move
+
+        :param color: (Integer) WHITE or BLACK
+        :return: None
+        """
+        if color != self.color:
+            self.key ^= ZOBRIST_BLACK
+        self.color = color
+
+    def set_castling(self, castling):
+        """
+        This method sets the castling rights
+
+        :param castling: (Integer) The CASTLE_* flags that are still available
+        :return: None
+        """
+        self.key ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_CASTLING[castling]
+        self.castling = castling
+
+    def set_en_passant(self, en_passant):
+        """
+        This method sets the en passant square
+
+        :param en_passant: (Integer) The square a Pawn skipped over with its double step, or None
+        :return: None
+        """
+        if self.en_passant is not None:
+            self.key ^= ZOBRIST_EN_PASSANT[self.en_passant % common.DIMENSION]
+        if en_passant is not None:
+            self.key ^= ZOBRIST_EN_PASSANT[en_passant % common.DIMENSION]
+        self.en_passant = en_passant
+
+    def compute_key(self):
+        """
+        This method computes the Zobrist key of the position from scratch (used to verify the incremental updates)
+
+        :return: (Integer) The Zobrist key
+        """
+        key = ZOBRIST_CASTLING[self.castling]
+        for (sq, code) in enumerate(self.squares):
+            if code != NO_PIECE:
+                key ^= ZOBRIST_PIECES[code][sq]
+
+        if self.en_passant is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant % common.DIMENSION]
+        if self.color == BLACK:
+            key ^= ZOBRIST_BLACK
+        return key
+
+    def move_piece(self, last_sq, next_sq):
+        """
+        This method moves a piece from one square to another, capturing whatever was on the destination square
+
+        :param last_sq: (Integer) The square the piece leaves
+        :param next_sq: (Integer) The square the piece arrives on
+        :return: None
+        """
+        code = self.squares[last_sq]
+        self.set_square(last_sq, NO_PIECE)
+        self.set_square(next_sq, code)
+        self.set_castling(self.castling & CASTLING_MASKS[last_sq] & CASTLING_MASKS[next_sq])
+
+    def king_square(self, color):
+        """
+        This method returns the square of the King of the requested color
+
+        :param color: (Integer) WHITE or BLACK
+        :return: (Integer) The square index, or None if there is no King
+        """
+        king = self.pieces[color * 6 + KING]
+        if not king:
+            return None
+        return king.bit_length() - 1
+
+    def update_attacks(self):
+        """
+        This method brings the attack maps up to date. Only the pieces standing on the squares that changed and the
+        sliding pieces whose rays reached one of those squares are recomputed.
+
+        :return: None
+        """
+        changed = self.changed_squares
+        if not changed:
+            return
+        self.changed_squares = 0
+
+        pieces = self.pieces
+        squares = self.squares
+        attacks = self.attacks
+        occupancy = self.occupancy[WHITE] | self.occupancy[BLACK]
+
+        sliders = pieces[BISHOP] | pieces[ROOK] | pieces[QUEEN] | \
+            pieces[6 + BISHOP] | pieces[6 + ROOK] | pieces[6 + QUEEN]
+        affected = changed
+        for sq in iter_bits(sliders & ~changed):
+            if attacks[sq] & changed:
+                affected |= BITS[sq]
+
+        for sq in iter_bits(affected):
+            code = squares[sq]
+            attacks[sq] = 0 if code == NO_PIECE else piece_attacks(code, sq, occupancy)
+
+        for color in (WHITE, BLACK):
+            attack_map = 0
+            for sq in iter_bits(self.occupancy[color]):
+                attack_map |= attacks[sq]
+            self.attack_maps[color] = attack_map
+
+    def attack_map(self, color):
+        """
+        This method returns all the squares attacked by the pieces of a given color
+
+        :param color: (Integer) WHITE or BLACK
+        :return: (Integer) The attack map
+        """
+        if self.changed_squares:
+            self.update_attacks()
+        return self.attack_maps[color]
+
+    def in_check(self, color=None):
+        """
+        This method determines whether or not the King of a given color is attacked
+
+        :param color: (Integer) The color of the King (the side to move by default)
+        :return: Boolean (True or False)
+        """
+        if color is None:
+            color = self.color
+        return self.attack_map(color ^ 1) & self.pieces[color * 6 + KING] != 0
+
+    def attackers(self, sq, color, occupancy=None):
+        """
+        This method computes all the pieces of a given color that attack a square
+
+        :param sq: (Integer) The attacked square
+        :param color: (Integer) The color of the attacking pieces
+        :param occupancy: (Integer) The occupied squares to use for the sliding pieces (the current ones by default)
+        :return: (Integer) The bitboard of the attacking pieces
+        """
+        if occupancy is None:
+            occupancy = self.occupancy[WHITE] | self.occupancy[BLACK]
+
+        pieces = self.pieces
+        offset = color * 6
+        queens = pieces[offset + QUEEN]
+        return (PAWN_ATTACKS[color ^ 1][sq] & pieces[offset + PAWN]) | \
+            (KNIGHT_ATTACKS[sq] & pieces[offset + KNIGHT]) | \
+            (KING_ATTACKS[sq] & pieces[offset + KING]) | \
+            (slider_attacks(sq, occupancy, BISHOP_DIRECTIONS) & (pieces[offset + BISHOP] | queens)) | \
+            (slider_attacks(sq, occupancy, ROOK_DIRECTIONS) & (pieces[offset + ROOK] | queens))
+
+    def is_attacked(self, sq, color, occupancy=None):
+        """
+        This method determines whether or not a square is attacked by any piece of a given color
+
+        :param sq: (Integer) The square index
+        :param color: (Integer) The color of the attacking pieces
+        :param occupancy: (Integer) The occupied squares to use for the sliding pieces (the current ones by default)
+        :return: Boolean (True or False)
+        """
+        if occupancy is None:
+            return self.attack_map(color) & BITS[sq] != 0
+        return self.attackers(sq, color, occupancy) != 0
+
+    def targets(self, sq):
+        """
+        This method computes the squares the piece on a given square can move to. Sliding pieces stop at the first
+        blocker, the King avoids attacked squares and may castle, Pawns may capture en passant.
+
+        :param sq: (Integer) The square of the chess piece
+        :return: (Integer) The bitboard of the target squares
+        """
+        code = self.squares[sq]
+        if code == NO_PIECE:
+            return 0
+
+        color = code // 6
+        piece_type = code % 6
+        own = self.occupancy[color]
+        enemy = self.occupancy[color ^ 1]
+        occupancy = own | enemy
+
+        if piece_type == PAWN:
+            step = -8 if color == WHITE else 8
+            targets = 0
+            forward = sq + step
+            if 0 <= forward < 64 and not occupancy & BITS[forward]:
+                targets |= BITS[forward]
+                start_row = 6 if color == WHITE else 1
+                if sq // 8 == start_row and not occupancy & BITS[forward + step]:
+                    targets |= BITS[forward + step]
+
+            captures = PAWN_ATTACKS[color][sq]
+            targets |= captures & enemy
+            if self.en_passant is not None and color == self.color and captures & BITS[self.en_passant]:
+                targets |= BITS[self.en_passant]
+            return targets
+
+        if piece_type != KING:
+            return piece_attacks(code, sq, occupancy) & ~own
+
+        # the King may not step into an attacked square. Sliding pieces see through the King's current square, which
+        # only matters when one of them is already giving check.
+        enemy_attacks = self.attack_map(color ^ 1)
+        targets = KING_ATTACKS[sq] & ~own & ~enemy_attacks
+        without_king = occupancy ^ BITS[sq]
+        in_check = enemy_attacks & BITS[sq]
+        if in_check:
+            for target in iter_bits(targets):
+                if self.is_attacked(target, color ^ 1, without_king):
+                    targets ^= BITS[target]
+
+        rights = (CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN) if color == WHITE else (CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN)
+        if self.castling & rights[0] and not occupancy & (BITS[sq + 1] | BITS[sq + 2]) and \
+                not enemy_attacks & BITS[sq + 2] and \
+                not (in_check and self.is_attacked(sq + 2, color ^ 1, without_king)):
+            targets |= BITS[sq + 2]
+
+        if self.castling & rights[1] and not occupancy & (BITS[sq - 1] | BITS[sq - 2] | BITS[sq - 3]) and \
+                not enemy_attacks & BITS[sq - 2] and \
+                not (in_check and self.is_attacked(sq - 2, color ^ 1, without_king)):
+            targets |= BITS[sq - 2]
+
+        return targets
+
+    def legal_moves(self, sources=FULL):
+        """
+        This method generates all the legal moves of the side to move, without trying any of them. Pinned pieces and
+        checking pieces are found by casting rays from the King, so every move that is emitted is already legal.
+
+        :param sources: (Integer) The mask of the squares whose moves are wanted (default: all of them)
+        :return: (List[(Integer, Integer, Integer)]) The moves as (last square, next square, promotion piece type or
+                 None)
+        """
+        color = self.color
+        enemy_color = color ^ 1
+        pieces = self.pieces
+        squares = self.squares
+        own = self.occupancy[color]
+        enemy = self.occupancy[enemy_color]
+        occupancy = own | enemy
+        enemy_attacks = self.attack_map(enemy_color)
+
+        moves = []
+        king = self.king_square(color)
+        if king is None:
+            return moves
+
+        # King moves (sliding pieces see through the King's current square, which only matters while in check)
+        checkers = self.attackers(king, enemy_color)
+        without_king = occupancy ^ BITS[king]
+        for target in iter_bits(KING_ATTACKS[king] & ~own & ~enemy_attacks if sources & BITS[king] else 0):
+            if checkers and self.is_attacked(target, enemy_color, without_king):
+                continue
+            moves.append((king, target, None))
+
+        if checkers & (checkers - 1):  # double check: only the King can move
+            return moves
+
+        check_mask = FULL
+        if checkers:
+            checker = checkers.bit_length() - 1
+            check_mask = checkers | BETWEEN[king][checker]
+
+        # pinned pieces may only move along the ray between the King and the pinning piece
+        enemy_queens = pieces[enemy_color * 6 + QUEEN]
+        pins = {}
+        for direction in range(len(DIRECTIONS)):
+            blockers = RAYS[direction][king] & occupancy
+            if not blockers:
+                continue
+
+            positive = POSITIVE_DIRECTIONS[direction]
+            first = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+            if not own & BITS[first]:
+                continue
+
+            blockers &= RAYS[direction][first]
+            if not blockers:
+                continue
+
+            second = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+            sliders = pieces[enemy_color * 6 + (ROOK if direction in ROOK_DIRECTIONS else BISHOP)] | enemy_queens
+            if sliders & BITS[second]:
+                pins[first] = BETWEEN[king][second] | BITS[second]
+
+        step = -8 if color == WHITE else 8
+        start_row = 6 if color == WHITE else 1
+        last_row = 0 if color == WHITE else 7
+        for sq in iter_bits((own ^ BITS[king]) & sources):
+            allowed = check_mask & pins.get(sq, FULL) & ~own
+            piece_type = squares[sq] % 6
+
+            if piece_type != PAWN:
+                if piece_type == KNIGHT:
+                    targets = KNIGHT_ATTACKS[sq] if sq not in pins else 0
+                elif piece_type == BISHOP:
+                    targets = slider_attacks(sq, occupancy, BISHOP_DIRECTIONS)
+                elif piece_type == ROOK:
+                    targets = slider_attacks(sq, occupancy, ROOK_DIRECTIONS)
+                else:
+                    targets = slider_attacks(sq, occupancy, ROOK_DIRECTIONS) | \
+                        slider_attacks(sq, occupancy, BISHOP_DIRECTIONS)
+
+                for target in iter_bits(targets & allowed):
+                    moves.append((sq, target, None))
+                continue
+
+            targets = PAWN_ATTACKS[color][sq] & enemy
+            forward = sq + step
+            if not occupancy & BITS[forward]:
+                targets |= BITS[forward]
+                if sq // 8 == start_row and not occupancy & BITS[forward + step]:
+                    targets |= BITS[forward + step]
+
+            for target in iter_bits(targets & allowed):
+                if target // 8 == last_row:
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        moves.append((sq, target, promotion))
+                else:
+                    moves.append((sq, target, None))
+
+            # en passant: replay the capture on the occupancy to catch pins and discovered checks along the row
+            en_passant = self.en_passant
+            if en_passant is not None and PAWN_ATTACKS[color][sq] & BITS[en_passant]:
+                captured = en_passant_pawn(en_passant)
+                if checkers and not checkers & BITS[captured] and not check_mask & BITS[en_passant]:
+                    continue
+
+                after = (occupancy ^ BITS[sq] ^ BITS[captured]) | BITS[en_passant]
+                if slider_attacks(king, after, ROOK_DIRECTIONS) & (pieces[enemy_color * 6 + ROOK] | enemy_queens) or \
+                        slider_attacks(king, after, BISHOP_DIRECTIONS) & (pieces[enemy_color * 6 + BISHOP] |
+                                                                           enemy_queens):
+                    continue
+                moves.append((sq, en_passant, None))
+
+        # castling: the King may not be in check, nor pass through or land on an attacked square
+        if not checkers and sources & BITS[king]:
+            rights = (CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN) if color == WHITE else \
+                (CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN)
+            if self.castling & rights[0] and not occupancy & (BITS[king + 1] | BITS[king + 2]) and \
+                    not enemy_attacks & (BITS[king + 1] | BITS[king + 2]):
+                moves.append((king, king + 2, None))
+
+            if self.castling & rights[1] and not occupancy & (BITS[king - 1] | BITS[king - 2] | BITS[king - 3]) and \
+                    not enemy_attacks & (BITS[king - 1] | BITS[king - 2]):
+                moves.append((king, king - 2, None))
+
+        return moves
+# endregion BitBoard
@@ -1,10 +1,149 @@
 """
 The part of the project that deals with the login between chess pieces
 """
-import copy
+from collections import namedtuple
 
 import common
-from piece import Rook, Knight, Bishop, Queen, King, Pawn, Empty
+from bitboard import BitBoard, BITS, POSITIONS, WHITE, BLACK, PAWN, ROOK, KING, COLORS, COLOR_INDEX, CASTLING_MASKS, \
+    PIECE_NAMES, PIECE_INDEX, NO_PIECE, CASTLE_WHITE_KING, CASTLE_WHITE_QUEEN, CASTLE_BLACK_KING, CASTLE_BLACK_QUEEN, \
+    square, iter_bits, en_passant_pawn
+from evaluation import MATERIAL_SCORES, SQUARE_SCORES
+from piece import Rook, Knight, Bishop, Queen, King, Pawn, Empty, EMPTY
+
+PROMOTIONS = {
+    "Queen": Queen,
+    "Rook": Rook,
+    "Bishop": Bishop,
+    "Knight": Knight
+}
+
+# indexed by piece type (the low part of the piece codes)
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King)
+
+# castling flag, row of the King and column of the Rook
+CASTLING_CORNERS = [(CASTLE_WHITE_KING, 7, 7), (CASTLE_WHITE_QUEEN, 7, 0),
+                    (CASTLE_BLACK_KING, 0, 7), (CASTLE_BLACK_QUEEN, 0, 0)]
+
+NO_EN_PASSANT = 255  # en passant byte of a packed position without en passant square
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+FEN_SYMBOLS = "PNBRQKpnbrqk"  # indexed by piece code
+FEN_CODES = {symbol: code for (code, symbol) in enumerate(FEN_SYMBOLS)}
+FEN_CASTLING = ((CASTLE_WHITE_KING, "K"), (CASTLE_WHITE_QUEEN, "Q"),
+                (CASTLE_BLACK_KING, "k"), (CASTLE_BLACK_QUEEN, "q"))
+FEN_CASTLING_FLAGS = {symbol: right for (right, symbol) in FEN_CASTLING}
+FEN_COLORS = {"w": "white", "b": "black"}
+
+
+def position_name(position):
+    """
+    This function returns the algebraic name of a square (row 0 is the 8th rank)
+
+    :param position: (Integer, Integer) The position of the square
+    :return: (String) The square name, e.g. "e4"
+    """
+    (row, col) = position
+    return "abcdefgh"[col] + str(common.DIMENSION - row)
+
+
+def parse_fen(fen):
+    """
+    This function splits a FEN string into its fields, without building any chess piece. It is meant to be fast enough
+    for batch jobs over millions of positions.
+
+    :param fen: (String) The position in Forsyth-Edwards Notation (the move counters are optional)
+    :return: (List[Integer], String, Integer, Integer, Integer, Integer) The piece code of every square, the color of
+    the player to move, the castling flags, the en passant square (or None), the halfmove clock and the fullmove number
+    """
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError("Invalid FEN (%d fields): %s" % (len(fields), fen))
+
+    codes = []
+    ranks = fields[0].split("/")
+    if len(ranks) != common.DIMENSION:
+        raise ValueError("Invalid FEN piece placement: %s" % fen)
+    for rank in ranks:
+        start = len(codes)
+        for char in rank:
+            code = FEN_CODES.get(char)
+            if code is not None:
+                codes.append(code)
+            elif "1" <= char <= "8":
+                codes.extend([NO_PIECE] * (ord(char) - 48))
+            else:
+                raise ValueError("Invalid FEN piece placement: %s" % fen)
+        if len(codes) - start != common.DIMENSION:
+            raise ValueError("Invalid FEN piece placement: %s" % fen)
+
+    if codes.count(WHITE * 6 + KING) != 1 or codes.count(BLACK * 6 + KING) != 1:
+        raise ValueError("Invalid FEN (each side needs exactly one King): %s" % fen)
+
+    current_color = FEN_COLORS.get(fields[1])
+    if current_color is None:
+        raise ValueError("Invalid FEN color: %s" % fen)
+
+    castling = 0
+    if fields[2] != "-":
+        for char in fields[2]:
+            if char not in FEN_CASTLING_FLAGS:
+                raise ValueError("Invalid FEN castling rights: %s" % fen)
+            castling |= FEN_CASTLING_FLAGS[char]
+    for (right, row, col) in CASTLING_CORNERS:  # the King and the Rook have to be on their home squares
+        color = WHITE if row == 7 else BLACK
+        if castling & right and (codes[square(row, 4)] != color * 6 + KING or
+                                 codes[square(row, col)] != color * 6 + ROOK):
+            raise ValueError("Invalid FEN castling rights: %s" % fen)
+
+    en_passant = None
+    if fields[3] != "-":
+        # the skipped square is on the 6th rank when White is to move, on the 3rd rank when Black is
+        en_passant_rank = "6" if current_color == "white" else "3"
+        if len(fields[3]) != 2 or not "a" <= fields[3][0] <= "h" or fields[3][1] != en_passant_rank:
+            raise ValueError("Invalid FEN en passant square: %s" % fen)
+        en_passant = square(common.DIMENSION - int(fields[3][1]), ord(fields[3][0]) - 97)
+        pawn_color = BLACK if current_color == "white" else WHITE
+        if codes[en_passant_pawn(en_passant)] != pawn_color * 6 + PAWN:
+            raise ValueError("Invalid FEN en passant square: %s" % fen)
+
+    halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+    fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+    return codes, current_color, castling, en_passant, halfmove_clock, fullmove_number
+
+
+# promotion is the name of the piece a Pawn turns into on the last row (None stands for the default Queen)
+class Move(namedtuple("Move", ["last_position", "next_position", "promotion"], defaults=[None])):
+    __slots__ = ()
+
+    def __str__(self):
+        """
+        This method returns the move in coordinate notation, e.g. "e2e4" or "e7e8q"
+
+        :return: (String) The move
+        """
+        promotion = "" if self.promotion is None else PROMOTIONS[self.promotion].short_name.lower()
+        return position_name(self.last_position) + position_name(self.next_position) + promotion
+
+    def encode(self):
+        """
+        This method packs the move into a 15-bit integer (last square, next square, promotion piece type)
+
+        :return: (Integer) The packed move
+        """
+        promotion = 0 if self.promotion is None else PIECE_INDEX[self.promotion]
+        return square(*self.last_position) | square(*self.next_position) << 6 | promotion << 12
+
+    @classmethod
+    def decode(cls, value):
+        """
+        This method unpacks a move packed with encode()
+
+        :param value: (Integer) The packed move
+        :return: (Move) The move
+        """
+        promotion = value >> 12
+        return cls(POSITIONS[value & 63], POSITIONS[value >> 6 & 63], PIECE_NAMES[promotion] if promotion else None)
 
 
 class Board(object):
@@ -13,16 +152,16 @@ class Board(object):
         self.cols = common.DIMENSION
 
         self.current_color = "white"
+        self.halfmove_clock = 0  # plies since the last capture or Pawn move
+        self.fullmove_number = 1
 
         self.king_position = {
             "black": (0, 4),
             "white": (7, 4)
         }
 
-        self.board_inst = {}
-        for row in range(self.rows):
-            for col in range(self.cols):
-                self.board_inst[row, col] = Empty(row, col, None)
+        # the (row, col) keys are shared by every board instance
+        self.board_inst = dict.fromkeys(POSITIONS, EMPTY)
 
         self.board_inst[0, 0] = Rook(0, 0, 'black')
         self.board_inst[0, 1] = Knight(0, 1, 'black')
@@ -46,6 +185,15 @@ class Board(object):
             self.board_inst[1, i] = Pawn(1, i, 'black')
             self.board_inst[6, i] = Pawn(6, i, 'white')
 
+        # material and piece-square scores of each color, updated by set_piece (see evaluate)
+        self.material = [0, 0]
+        self.positional = [0, 0]
+
+        self.update_bitboard()
+        self.undo_stack = []
+        self.valid_moves_cache = {}  # the legal next positions of the pieces selected in the current position
+        self.valid_moves_key = None
+
     def select(self, position):
         """
         This function selects the current chess piece that was clicked on
@@ -57,6 +205,7 @@ class Board(object):
         if not isinstance(self.board_inst[row, col], Empty) and \
                 self.board_inst[row, col].color == self.current_color:
             self.board_inst[row, col].select()
+            self.board_inst[row, col].valid_moves = self.get_valid_moves(position)
 
     def cancel(self):
         """
@@ -78,12 +227,195 @@ class Board(object):
         (row, col) = position
         return self.board_inst[row, col]
 
-    def move(self, last_position, next_position):
+    def set_piece(self, position, piece):
+        """
+        This method places a chess piece at the requested position, keeping the bitboards in sync
+
+        :param position: (Integer, Integer) The position on the board
+        :param piece: (Piece) The chess piece (Empty to clear the square)
+        :return: None
+        """
+        (row, col) = position
+        sq = square(row, col)
+        previous = self.board_inst[row, col].code
+        if previous != NO_PIECE:
+            self.material[previous // 6] -= MATERIAL_SCORES[previous]
+            self.positional[previous // 6] -= SQUARE_SCORES[previous][sq]
+        if piece.code != NO_PIECE:
+            self.material[piece.code // 6] += MATERIAL_SCORES[piece.code]
+            self.positional[piece.code // 6] += SQUARE_SCORES[piece.code][sq]
+
+        self.board_inst[row, col] = piece
+        self.bitboard.set_square(sq, piece.code)
+
+    def update_bitboard(self):
+        """
+        This method rebuilds the bitboard representation and the evaluation scores from the current board instance
+        (after the board instance was replaced or edited directly)
+
+        :return: None
+        """
+        self.bitboard = BitBoard.from_board_inst(self.board_inst, self.current_color)
+        (self.material, self.positional) = self.compute_scores()
+
+    def compute_scores(self):
+        """
+        This method sums the material and piece-square scores of each color from scratch (used to set them up and to
+        verify the incremental updates)
+
+        :return: (List[Integer], List[Integer]) The material and the piece-square scores of White and Black
+        """
+        (material, positional) = ([0, 0], [0, 0])
+        for (sq, code) in enumerate(self.bitboard.squares):
+            if code != NO_PIECE:
+                material[code // 6] += MATERIAL_SCORES[code]
+                positional[code // 6] += SQUARE_SCORES[code][sq]
+        return material, positional
+
+    def evaluate(self):
+        """
+        This method evaluates the position from the point of view of the player to move, from the material and
+        piece-square scores kept up to date by set_piece, so it runs in constant time
+
+        :return: (Integer) The score in centipawns
+        """
+        score = self.material[WHITE] - self.material[BLACK] + self.positional[WHITE] - self.positional[BLACK]
+        return score if self.bitboard.color == WHITE else -score
+
+    def load_position(self, codes, current_color, castling, en_passant):
+        """
+        This method replaces the whole position. The first-move flags of the Kings, Rooks and Pawns are derived from
+        the castling rights, the en passant square and the Pawns' rows.
+
+        :param codes: (List[Integer]) The piece code of every square (NO_PIECE for the empty ones)
+        :param current_color: (String) The color of the player to move
+        :param castling: (Integer) The CASTLE_* flags that are still available
+        :param en_passant: (Integer) The square a Pawn skipped over with its double step, or None
+        :return: None
+        """
+        self.board_inst = dict.fromkeys(POSITIONS, EMPTY)
+        for (sq, code) in enumerate(codes):
+            if code == NO_PIECE:
+                continue
+
+            (row, col) = POSITIONS[sq]
+            color = COLORS[code // 6]
+            piece = PIECE_CLASSES[code % 6](row, col, color)
+            if isinstance(piece, (King, Rook)):
+                piece.has_been_moved = True
+            if isinstance(piece, King):
+                self.king_position[color] = (row, col)
+            if isinstance(piece, Pawn):
+                piece.initial_position = row == (6 if color == "white" else 1)
+            self.board_inst[row, col] = piece
+
+        for (right, row, col) in CASTLING_CORNERS:
+            if castling & right:
+                self.board_inst[row, 4].has_been_moved = False
+                self.board_inst[row, col].has_been_moved = False
+
+        if en_passant is not None:
+            self.get_piece(POSITIONS[en_passant_pawn(en_passant)]).initial_move = True
+
+        self.current_color = current_color
+        (self.halfmove_clock, self.fullmove_number) = (0, 1)
+        self.undo_stack = []
+        self.update_bitboard()
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        This method builds a board from a FEN string
+
+        :param fen: (String) The position in Forsyth-Edwards Notation
+        :return: (Board) The board
+        """
+        (codes, current_color, castling, en_passant, halfmove_clock, fullmove_number) = parse_fen(fen)
+        board = cls()
+        board.load_position(codes, current_color, castling, en_passant)
+        (board.halfmove_clock, board.fullmove_number) = (halfmove_clock, fullmove_number)
+        return board
+
+    def to_fen(self):
+        """
+        This method writes the position as a FEN string
+
+        :return: (String) The position in Forsyth-Edwards Notation
+        """
+        squares = self.bitboard.squares
+        ranks = []
+        for row in range(0, 64, 8):
+            (rank, empty) = ("", 0)
+            for code in squares[row:row + 8]:
+                if code == NO_PIECE:
+                    empty += 1
+                    continue
+                if empty:
+                    (rank, empty) = (rank + str(empty), 0)
+                rank += FEN_SYMBOLS[code]
+            ranks.append(rank + str(empty) if empty else rank)
+
+        castling = "".join(symbol for (right, symbol) in FEN_CASTLING if self.bitboard.castling & right) or "-"
+        en_passant = "-" if self.bitboard.en_passant is None else position_name(POSITIONS[self.bitboard.en_passant])
+        return "%s %s %s %s %d %d" % ("/".join(ranks), self.current_color[0], castling, en_passant,
+                                      self.halfmove_clock, self.fullmove_number)
+
+    def pack(self):
+        """
+        This method serializes the position into 35 bytes: two piece codes per byte for the 64 squares, then the
+        player to move, the castling rights and the en passant square
+
+        :return: (Bytes) The packed position
+        """
+        squares = self.bitboard.squares
+        data = bytearray(squares[sq] | squares[sq + 1] << 4 for sq in range(0, 64, 2))
+        en_passant = NO_EN_PASSANT if self.bitboard.en_passant is None else self.bitboard.en_passant
+        data += bytes([self.bitboard.color, self.bitboard.castling, en_passant])
+        return bytes(data)
+
+    @classmethod
+    def unpack(cls, data):
+        """
+        This method rebuilds a board from a position serialized with pack()
+
+        :param data: (Bytes) The packed position
+        :return: (Board) The board
+        """
+        codes = [data[sq >> 1] >> 4 * (sq & 1) & 15 for sq in range(64)]
+        board = cls()
+        board.load_position(codes, COLORS[data[32]], data[33], None if data[34] == NO_EN_PASSANT else data[34])
+        return board
+
+    def get_zobrist_key(self):
+        """
+        This method returns the Zobrist key of the current position (piece placement, player to move, castling rights
+        and en passant square)
+
+        :return: (Integer) The 64-bit Zobrist key
+        """
+        return self.bitboard.key
+
+    def verify_key(self):
+        """
+        This method checks, only if the FLAG_VERIFY_KEYS flag is set, that the incrementally updated Zobrist key and
+        evaluation scores match a full recompute
+
+        :return: None
+        """
+        if not common.FLAG_VERIFY_KEYS:
+            return
+        if self.bitboard.key != self.bitboard.compute_key():
+            common.error("Zobrist key out of sync: %016x != %016x" % (self.bitboard.key, self.bitboard.compute_key()))
+        if (self.material, self.positional) != self.compute_scores():
+            common.error("Evaluation out of sync: %r != %r" % ((self.material, self.positional), self.compute_scores()))
+
+    def move(self, last_position, next_position, promotion=None):
         """
         This method moves the selected chess piece from the last position to the next one
 
         :param last_position: (Integer, Integer) The last position of the selected chess piece
         :param next_position: (Integer, Integer) The next position of the selected chess piece
+        :param promotion: (String) The name of the piece a Pawn is promoted to (Queen by default)
         :return: None
         """
         if last_position == next_position:
@@ -92,11 +424,98 @@ class Board(object):
         (last_row, last_col) = last_position
         (next_row, next_col) = next_position
 
-        self.special_moves_cases(last_position, next_position)
-        self.board_inst[next_row, next_col] = self.board_inst[last_row, last_col]
-        self.board_inst[last_row, last_col] = Empty(last_row, last_col, None)
+        piece = self.board_inst[last_row, last_col]
+        if isinstance(piece, Pawn) or not isinstance(self.board_inst[next_row, next_col], Empty):
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if piece.color == "black":
+            self.fullmove_number += 1
+
+        self.special_moves_cases(last_position, next_position, promotion)
+        self.set_piece(next_position, self.board_inst[last_row, last_col])
+        self.set_piece(last_position, EMPTY)
+        self.bitboard.set_castling(self.bitboard.castling & CASTLING_MASKS[square(last_row, last_col)] &
+                                   CASTLING_MASKS[square(next_row, next_col)])
 
         self.board_inst[next_row, next_col].move(next_row, next_col)
+        self.verify_key()
+
+    def make_move(self, move):
+        """
+        This method plays a move for the current player and records everything needed to take it back
+
+        :param move: (Move) The move that is being made
+        :return: None
+        """
+        (last_position, next_position, promotion) = move
+        (last_row, last_col) = last_position
+        (next_row, next_col) = next_position
+
+        piece = self.board_inst[last_row, last_col]
+        captured_position = next_position
+        if isinstance(piece, Pawn) and last_col != next_col and isinstance(self.board_inst[next_row, next_col], Empty):
+            captured_position = (last_row, next_col)  # en passant
+
+        if isinstance(piece, Pawn):
+            first_move = piece.initial_position
+        elif isinstance(piece, (King, Rook)):
+            first_move = not piece.has_been_moved
+        else:
+            first_move = False
+
+        self.undo_stack.append((move, piece, first_move, self.board_inst[captured_position], captured_position,
+                                self.bitboard.castling, self.bitboard.en_passant, self.king_position[piece.color],
+                                self.halfmove_clock))
+
+        self.move(last_position, next_position, promotion)
+        if isinstance(piece, King):
+            self.king_position[piece.color] = next_position
+        self.update_current_color()
+
+    def unmake_move(self):
+        """
+        This method takes back the last move that was played with make_move
+
+        :return: None
+        """
+        (move, piece, first_move, captured, captured_position,
+         castling, en_passant, king_position, self.halfmove_clock) = self.undo_stack.pop()
+        (last_position, next_position, _) = move
+        (last_row, last_col) = last_position
+        (next_row, next_col) = next_position
+
+        self.update_current_color()
+
+        if self.bitboard.en_passant is not None:
+            self.get_piece(POSITIONS[en_passant_pawn(self.bitboard.en_passant)]).initial_move = False
+
+        self.set_piece(next_position, EMPTY)
+        self.set_piece(captured_position, captured)
+        self.set_piece(last_position, piece)
+        (piece.row, piece.col) = last_position
+
+        if isinstance(piece, Pawn):
+            piece.initial_position = first_move
+        elif isinstance(piece, (King, Rook)):
+            piece.has_been_moved = not first_move
+
+        # castling: put the Rook back in its corner
+        if isinstance(piece, King) and abs(next_col - last_col) == 2:
+            (rook_col, corner_col) = (5, 7) if next_col == 6 else (3, 0)
+            rook = self.board_inst[last_row, rook_col]
+            self.set_piece((last_row, rook_col), EMPTY)
+            self.set_piece((last_row, corner_col), rook)
+            (rook.row, rook.col, rook.has_been_moved) = (last_row, corner_col, False)
+
+        self.bitboard.set_castling(castling)
+        self.bitboard.set_en_passant(en_passant)
+        if en_passant is not None:
+            self.get_piece(POSITIONS[en_passant_pawn(en_passant)]).initial_move = True
+        self.king_position[piece.color] = king_position
+        if piece.color == "black":
+            self.fullmove_number -= 1
+        self.verify_key()
 
     def update_valid_moves(self):
         """
@@ -104,42 +523,62 @@ class Board(object):
 
         :return: None
         """
-        for row in range(self.rows):
-            for col in range(self.cols):
-                self.board_inst[row, col].update_valid_moves(self.board_inst)
+        for (sq, (row, col)) in enumerate(POSITIONS):
+            piece = self.board_inst[row, col]
+            if isinstance(piece, Empty):
+                continue
 
-    def filter_valid_moves(self):
+            piece.valid_moves = [POSITIONS[target] for target in iter_bits(self.bitboard.targets(sq))]
+
+    def generate_legal_moves(self):
         """
-        This method filters the valid moves list of all chess pieces across the board (in case of check)
+        This method generates all the legal moves of the current player (check evasions, pins, castling and en passant
+        rules included). Pawns reaching the last row get one move for every piece they can be promoted to.
 
-        :return: None
+        :return: (List[Move]) The legal moves
         """
-        def remove_invalid_moves(board_inst, current_piece):
-            temp_board = Board()
-            temp_board.board_inst = copy.deepcopy(board_inst)
-            temp_board.current_color = current_piece.color
+        return [Move(POSITIONS[last_sq], POSITIONS[next_sq], None if promotion is None else PIECE_NAMES[promotion])
+                for (last_sq, next_sq, promotion) in self.bitboard.legal_moves()]
 
-            for (valid_row, valid_col) in current_piece.valid_moves:
-                temp_board.move((current_piece.row, current_piece.col), (valid_row, valid_col))
-                temp_board.get_piece((valid_row, valid_col)).update_valid_moves(temp_board.board_inst)
+    def get_valid_moves(self, position):
+        """
+        This method returns the legal next positions of the current player's chess piece at the given position. Only
+        that piece's moves are generated, and they are remembered until the position changes (the cache is tagged with
+        the Zobrist key of the position it was computed for).
 
-                temp_board.is_in_check()
-                if temp_board.get_piece(temp_board.king_position["black"]).is_in_check or \
-                        temp_board.get_piece(temp_board.king_position["white"]).is_in_check:
-                    current_piece.valid_moves.remove((valid_row, valid_col))
+        :param position: (Integer, Integer) The position of the chess piece
+        :return: (List[(Integer, Integer)]) The next positions (empty for an empty square or the opponent's piece)
+        """
+        key = self.bitboard.key
+        if self.valid_moves_key != key:
+            (self.valid_moves_cache, self.valid_moves_key) = ({}, key)
 
-            del temp_board
+        valid_moves = self.valid_moves_cache.get(position)
+        if valid_moves is None:
+            valid_moves = []
+            for (_, next_sq, _) in self.bitboard.legal_moves(BITS[square(*position)]):
+                if POSITIONS[next_sq] not in valid_moves:  # the promotions share their next position
+                    valid_moves.append(POSITIONS[next_sq])
+            self.valid_moves_cache[position] = valid_moves
 
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if isinstance(self.board_inst[row, col], Empty):
-                    continue
+        return valid_moves
 
-                if (row, col) in [self.king_position["black"], self.king_position["white"]]:
-                    continue
+    def filter_valid_moves(self):
+        """
+        This method filters the valid moves list of the current player's chess pieces (in case of check)
 
-                piece = self.get_piece((row, col))
-                remove_invalid_moves(self.board_inst, piece)
+        :return: None
+        """
+        legal_moves = {}
+        for move in self.generate_legal_moves():
+            next_positions = legal_moves.setdefault(move.last_position, [])
+            if move.next_position not in next_positions:
+                next_positions.append(move.next_position)
+
+        for (row, col) in POSITIONS:
+            piece = self.board_inst[row, col]
+            if not isinstance(piece, Empty) and piece.color == self.current_color:
+                piece.valid_moves = legal_moves.get((row, col), [])
 
     def is_move_valid(self, last_position, next_position):
         """
@@ -149,15 +588,10 @@ class Board(object):
         :param next_position: (Integer, Integer) The next position of the selected chess piece
         :return: Boolean (True or False)
         """
-        (last_row, last_col) = last_position
-        (next_row, next_col) = next_position
-
-        self.board_inst[last_row, last_col].update_valid_moves(self.board_inst)
-        if self.board_inst[last_row, last_col].is_selected and \
-                self.board_inst[last_row, last_col].validate_move(next_row, next_col):
-            return True
+        if not self.get_piece(last_position).is_selected:
+            return False
 
-        return False
+        return next_position in self.get_valid_moves(last_position)
 
     def update_current_color(self):
         """
@@ -172,12 +606,15 @@ class Board(object):
         else:
             common.error("Unrecognized color: \"%s\". Exit game." % str(self.current_color))
 
-    def special_moves_cases(self, last_position, next_position):
+        self.bitboard.set_color(COLOR_INDEX[self.current_color])
+
+    def special_moves_cases(self, last_position, next_position, promotion=None):
         """
         This method tackles special moves such as "castling" or "en passant"
 
         :param last_position: (Integer, Integer) The last position of the selected chess piece
         :param next_position: (Integer, Integer) The next position of the selected chess piece
+        :param promotion: (String) The name of the piece a Pawn is promoted to (Queen by default)
         :return: None
         """
         (last_row, last_col) = last_position
@@ -191,8 +628,8 @@ class Board(object):
                 next_row == last_row and next_col == 6:
             # king_side_castling = True
             self.board_inst[last_row, 7].move(last_row, 5)
-            self.board_inst[last_row, 5] = self.board_inst[last_row, 7]
-            self.board_inst[last_row, 7] = Empty(last_row, 7, None)
+            self.set_piece((last_row, 5), self.board_inst[last_row, 7])
+            self.set_piece((last_row, 7), EMPTY)
 
         # check for queen's side castling
         if isinstance(self.board_inst[last_row, last_col], King) and \
@@ -202,21 +639,22 @@ class Board(object):
                 next_row == last_row and next_col == 2:
             # queen_side_castling = True
             self.board_inst[last_row, 0].move(last_row, 3)
-            self.board_inst[last_row, 3] = self.board_inst[last_row, 0]
-            self.board_inst[last_row, 0] = Empty(last_row, 7, None)
+            self.set_piece((last_row, 3), self.board_inst[last_row, 0])
+            self.set_piece((last_row, 0), EMPTY)
 
-        # reset special pawn case: en passant
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if isinstance(self.board_inst[i, j], Pawn) and \
-                        self.board_inst[i, j].color == self.current_color:
-                    self.board_inst[i, j].initial_move = False
+        # reset special pawn case: en passant (only the last Pawn that made a double step could be captured)
+        if self.bitboard.en_passant is not None:
+            last_pawn = self.get_piece(POSITIONS[en_passant_pawn(self.bitboard.en_passant)])
+            if isinstance(last_pawn, Pawn):
+                last_pawn.initial_move = False
+            self.bitboard.set_en_passant(None)
 
         # special pawn case (first move)
         if isinstance(self.board_inst[last_row, last_col], Pawn) and \
                 self.board_inst[last_row, last_col].initial_position is True and \
                 abs(next_row - last_row) == 2:
             self.board_inst[last_row, last_col].initial_move = True
+            self.bitboard.set_en_passant(square((last_row + next_row) // 2, last_col))
 
         # special case: en passant
         if isinstance(self.board_inst[last_row, last_col], Pawn) and \
@@ -225,16 +663,14 @@ class Board(object):
                 self.board_inst[last_row, next_col].color != self.board_inst[last_row, last_col].color and \
                 abs(next_col - last_col) == 1:
             # self.score[self.board_inst[last_row, last_col].color] += self.board_inst[last_row, next_col].strength
-            self.board_inst[last_row, next_col] = Empty(last_row, next_col, None)
+            self.set_piece((last_row, next_col), EMPTY)
 
-        # replace Pawn with Queen
-        if next_row == 0 and isinstance(self.board_inst[next_row, next_col], Pawn) and \
-                self.board_inst[next_row, next_col].color == 'white':
-            self.board_inst[next_row, next_col] = Queen(next_row, next_col, 'white')
-
-        if next_row == 7 and isinstance(self.board_inst[next_row, next_col], Pawn) and \
-                self.board_inst[next_row, next_col].color == 'black':
-            self.board_inst[next_row, next_col] = Queen(next_row, next_col, 'black')
+        # replace Pawn with Queen (the Pawn is swapped before it is moved onto the last row)
+        if isinstance(self.board_inst[last_row, last_col], Pawn) and \
+                ((next_row == 0 and self.board_inst[last_row, last_col].color == 'white') or
+                 (next_row == 7 and self.board_inst[last_row, last_col].color == 'black')):
+            promoted_piece = PROMOTIONS[promotion or "Queen"]
+            self.set_piece(last_position, promoted_piece(last_row, last_col, self.board_inst[last_row, last_col].color))
 
     def update_king_position(self, last_position, next_position):
         """
@@ -257,22 +693,29 @@ class Board(object):
 
         :return: None
         """
-        self.update_valid_moves()
+        for color in ["black", "white"]:
+            king_square = self.bitboard.king_square(COLOR_INDEX[color])
+            if king_square is None:
+                continue
 
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if (row, col) in [self.king_position["black"], self.king_position["white"]]:
-                    continue
+            king = self.get_piece(POSITIONS[king_square])
+            king.is_in_check = self.bitboard.is_attacked(king_square, COLOR_INDEX[color] ^ 1)
+
+    def is_square_attacked(self, position, color):
+        """
+        This method determines whether or not a square is attacked by any chess piece of a given color
 
-                piece = self.get_piece((row, col))
-                if self.king_position["black"] in piece.valid_moves and piece.color == "white":
-                    self.get_piece(self.king_position["black"]).is_in_check = True
-                    return
-                else:
-                    self.get_piece(self.king_position["black"]).is_in_check = False
-
-                if self.king_position["white"] in piece.valid_moves and piece.color == "black":
-                    self.get_piece(self.king_position["white"]).is_in_check = True
-                    return
-                else:
-                    self.get_piece(self.king_position["white"]).is_in_check = False
+        :param position: (Integer, Integer) The position of the square
+        :param color: (String) The color of the attacking pieces
+        :return: Boolean (True or False)
+        """
+        (row, col) = position
+        return self.bitboard.is_attacked(square(row, col), COLOR_INDEX[color])
+
+    def in_check(self):
+        """
+        This method determines whether or not the King of the current player is in check
+
+        :return: Boolean (True or False)
+        """
+        return self.bitboard.in_check()
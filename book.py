@@ -0,0 +1,197 @@
+"""
+The part of the project that deals with the opening book: the moves the engine plays in the opening without
+searching. The book is compiled offline from a PGN file and stored as fixed-size records sorted by the Zobrist key of
+the positions, so it is memory-mapped and queried with a binary search: opening it costs nothing and only the pages
+that are looked up are ever read, however large the book is:
+
+    python book.py games.pgn book.bin
+    python book.py games.pgn book.bin --max-ply 20 --min-games 5
+"""
+# region imports
+import argparse
+import mmap
+import os
+import random
+import struct
+import tempfile
+import time
+
+import common
+from board import Move
+from explorer import HEADER as INDEX_HEADER, RECORD as INDEX_RECORD, build_index
+# endregion imports
+
+
+# region constants
+MAGIC = b"CHSBOOK1"
+HEADER = struct.Struct("<8sQ")  # magic, number of records
+RECORD = struct.Struct("<QHH")  # Zobrist key, encoded move, weight
+KEY = struct.Struct("<Q")
+
+MAX_WEIGHT = 0xFFFF
+DEFAULT_MAX_PLY = 24  # plies of every game that go into the book
+DEFAULT_MIN_GAMES = 3  # games a move has to be played in to go into the book
+# endregion constants
+
+
+# region build
+def move_weights(moves, min_games):
+    """
+    This function weighs the moves played from a position by the points they scored (two per win, one per draw), the
+    way most opening books do. Rare moves and moves that never scored a point are left out, and the weights are
+    scaled down together if the largest one does not fit in a record.
+
+    :param moves: (List[(Integer, Integer, Integer, Integer)]) The encoded moves with their wins, draws and losses,
+    from the point of view of the player who made them
+    :param min_games: (Integer) The number of games a move has to be played in
+    :return: (List[(Integer, Integer)]) The encoded moves with their weights
+    """
+    weights = [(move, 2 * wins + draws) for (move, wins, draws, losses) in moves
+               if wins + draws + losses >= min_games and 2 * wins + draws > 0]
+    heaviest = max((weight for (_, weight) in weights), default=0)
+    if heaviest > MAX_WEIGHT:
+        weights = [(move, max(1, weight * MAX_WEIGHT // heaviest)) for (move, weight) in weights]
+    return weights
+
+
+def build_book(pgn_path, book_path, max_ply=DEFAULT_MAX_PLY, min_games=DEFAULT_MIN_GAMES):
+    """
+    This function compiles an opening book from the games of a PGN file. The games are first counted into a temporary
+    opening explorer index (which keeps the memory bounded for collections of any size), whose records are already
+    sorted by position, then every position's moves are weighed.
+
+    :param pgn_path: (String) The path of the PGN file
+    :param book_path: (String) The path of the book to write
+    :param max_ply: (Integer) The number of plies of every game that go into the book
+    :param min_games: (Integer) The number of games a move has to be played in to go into the book
+    :return: (Integer, Integer) The number of games read and the number of records written
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "book.idx")
+        (games, _, _) = build_index(pgn_path, index_path, max_ply, relative=True)
+
+        with open(index_path, "rb") as index, open(book_path, "wb") as book:
+            book.write(HEADER.pack(MAGIC, 0))
+            (records, key, moves) = (0, None, [])
+            index.seek(INDEX_HEADER.size)
+            while True:
+                data = index.read(INDEX_RECORD.size * 4096)
+                for (record_key, move, wins, draws, losses) in INDEX_RECORD.iter_unpack(data):
+                    if record_key != key:
+                        for (book_move, weight) in move_weights(moves, min_games):
+                            book.write(RECORD.pack(key, book_move, weight))
+                            records += 1
+                        (key, moves) = (record_key, [])
+                    moves.append((move, wins, draws, losses))
+                if not data:
+                    break
+
+            for (book_move, weight) in move_weights(moves, min_games):
+                book.write(RECORD.pack(key, book_move, weight))
+                records += 1
+            book.seek(0)
+            book.write(HEADER.pack(MAGIC, records))
+
+    return games, records
+# endregion build
+
+
+# region OpeningBook
+class OpeningBook(object):
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, self.size) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or HEADER.size + self.size * RECORD.size != len(self.data):
+            raise ValueError("%s is not an opening book" % path)
+
+    def key_at(self, index):
+        """
+        This method reads the key of a record
+
+        :param index: (Integer) The index of the record
+        :return: (Integer) The Zobrist key
+        """
+        return KEY.unpack_from(self.data, HEADER.size + index * RECORD.size)[0]
+
+    def lookup(self, key):
+        """
+        This method returns the book moves of a position, the heaviest first
+
+        :param key: (Integer) The Zobrist key of the position (Board.get_zobrist_key())
+        :return: (List[(Move, Integer)]) The moves with their weights
+        """
+        (low, high) = (0, self.size)
+        while low < high:  # the first record whose key is not smaller than the requested one
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        for index in range(low, self.size):
+            (record_key, move, weight) = RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+            if record_key != key:
+                break
+            moves.append((Move.decode(move), weight))
+
+        moves.sort(key=lambda entry: -entry[1])
+        return moves
+
+    def choose(self, board, best=False):
+        """
+        This method picks a book move for the current position, at random with probabilities proportional to the
+        weights (so the engine does not always play the same opening), or the heaviest one
+
+        :param board: (Board) The current position
+        :param best: (Boolean) Whether or not to pick the heaviest move instead of a random one
+        :return: (Move) The book move, or None if the position is not in the book
+        """
+        legal_moves = board.generate_legal_moves()
+        moves = [(move, weight) for (move, weight) in self.lookup(board.get_zobrist_key())
+                 if move in legal_moves]  # a different position with the same key would give illegal moves
+        if not moves:
+            return None
+        if best:
+            return moves[0][0]
+        return random.choices([move for (move, _) in moves], weights=[weight for (_, weight) in moves])[0]
+
+    def close(self):
+        """
+        This method releases the memory map and the file
+
+        :return: None
+        """
+        self.data.close()
+        self.file.close()
+# endregion OpeningBook
+
+
+# region main
+def main():
+    """
+    This method parses the command line and compiles a book
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Compile an opening book from a PGN file")
+    parser.add_argument("pgn", help="PGN file")
+    parser.add_argument("book", help="book file to write")
+    parser.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY,
+                        help="plies of every game that go into the book (default: %d)" % DEFAULT_MAX_PLY)
+    parser.add_argument("--min-games", type=int, default=DEFAULT_MIN_GAMES,
+                        help="games a move has to be played in (default: %d)" % DEFAULT_MIN_GAMES)
+    arguments = parser.parse_args()
+
+    common.FLAG_DEBUG = False
+    start = time.perf_counter()
+    (games, records) = build_book(arguments.pgn, arguments.book, arguments.max_ply, arguments.min_games)
+    print("%d games, %d records, %d bytes in %.2fs" %
+          (games, records, os.path.getsize(arguments.book), time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
+# endregion main
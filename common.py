@@ -13,11 +13,14 @@ WIDTH = HEIGHT = 512
 DIMENSION = 8
 SQUARE_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 15
+EVENT_DRIVEN = True  # the main loop sleeps until something happens instead of running at MAX_FPS
+EVENT_WAIT_TIMEOUT = 1000  # milliseconds the event-driven main loop sleeps at most when nothing is going on
 
 TITLE = "Python Chess Game v0.1"
 ICON = "Knight"
 
 FLAG_DEBUG = True
+FLAG_VERIFY_KEYS = False  # recompute the Zobrist key and the evaluation scores after every move (slow, for debugging)
 
 
 # region GameMode
@@ -28,6 +31,17 @@ class GameMode(Enum):
 
 
 GAME_MODE = GameMode.MULTI_PLAYER
+HUMAN_COLOR = "white"  # in single player mode, the engine plays the other color
+
+ENGINE_TIME_LIMIT = 3.0  # seconds of thinking per engine move
+ENGINE_MAX_DEPTH = 64
+ENGINE_WORKERS = 1  # processes searching in parallel (1 keeps the search in the game's process)
+HASH_SIZE_MB = 16  # memory budget of the engine's transposition table
+TABLEBASE_PATH = "tablebases"  # endgame tables generated with tablebase.py (searched normally if there are none)
+BOOK_PATH = "book.bin"  # opening book built with book.py (the engine searches every move if the file does not exist)
+
+EXPLORER_PATH = "explorer.idx"  # index built with explorer.py (the panel stays empty if the file does not exist)
+EXPLORER_MOVES = 12  # moves listed by the opening explorer panel
 # endregion constants
 
 
@@ -0,0 +1,107 @@
+"""
+The part of the project that runs the engine in a background thread, so that the caller (the pygame loop, the UCI
+loop) keeps running while the engine thinks. The search works on its own copy of the board.
+"""
+# region imports
+import threading
+
+import common
+from board import Board
+from parallel import ParallelSearch, create_pool
+from search import Search
+from tablebase import Tablebases
+from transposition import TranspositionTable
+# endregion imports
+
+
+# region Engine
+class Engine(object):
+    def __init__(self, workers=None):
+        self.workers = common.ENGINE_WORKERS if workers is None else workers
+        self.table = TranspositionTable()
+        self.pool = create_pool(self.workers) if self.workers > 1 else None
+        self.tablebases = Tablebases()  # empty if no table was generated
+
+        self.search = None
+        self.thread = None
+        self.cancelled = False
+
+    def think(self, board, on_move, time_limit=None, max_depth=None, on_depth=None, max_nodes=None):
+        """
+        This method starts searching a position in the background. When the search is over, on_move is called from
+        the engine's thread with the best move (None if there is no legal move) and the search itself.
+
+        :param board: (Board) The position (it is copied, so the caller can keep using it)
+        :param on_move: (Function) The callback that receives the best move and the search
+        :param time_limit: (Float) The seconds of thinking (default: common.ENGINE_TIME_LIMIT)
+        :param max_depth: (Integer) The maximum depth (default: common.ENGINE_MAX_DEPTH)
+        :param on_depth: (Function) The callback that receives the search after every finished iteration
+        :param max_nodes: (Integer) The number of nodes after which the search stops (default: no limit)
+        :return: None
+        """
+        self.cancel()
+
+        board = Board.unpack(board.pack())
+        if self.pool is None:
+            self.search = Search(board, time_limit, max_depth, self.table)
+        else:
+            self.search = ParallelSearch(board, self.pool, time_limit, max_depth, self.table)
+        self.search.on_depth = on_depth
+        self.search.max_nodes = max_nodes
+        self.search.tablebases = self.tablebases
+
+        self.cancelled = False
+        self.thread = threading.Thread(target=self.run, args=(self.search, on_move), daemon=True)
+        self.thread.start()
+
+    def run(self, search, on_move):
+        """
+        This method is the body of the engine's thread
+
+        :param search: (Search) The search to run
+        :param on_move: (Function) The callback that receives the best move and the search
+        :return: None
+        """
+        move = search.search()
+        if not self.cancelled:
+            on_move(move, search)
+
+    def is_thinking(self):
+        """
+        This method determines whether or not a search is running
+
+        :return: Boolean (True or False)
+        """
+        return self.thread is not None and self.thread.is_alive()
+
+    def stop(self):
+        """
+        This method stops the running search, which still reports the best move found so far, and waits for it
+
+        :return: None
+        """
+        if self.is_thinking():
+            self.search.stop()
+            self.thread.join()
+
+    def cancel(self):
+        """
+        This method stops the running search and drops its result
+
+        :return: None
+        """
+        self.cancelled = True
+        self.stop()
+
+    def close(self):
+        """
+        This method stops the engine and its worker processes
+
+        :return: None
+        """
+        self.cancel()
+        self.tablebases.close()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+# endregion Engine
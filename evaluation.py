@@ -0,0 +1,103 @@
+"""
+The part of the project that deals with the static evaluation tables: the material value of every piece and the
+piece-square tables that reward good squares (central Knights, advanced Pawns, a sheltered King). The board keeps the
+sum of both up to date move after move, so evaluating a position costs nothing (see Board.evaluate).
+"""
+# region imports
+from bitboard import WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from piece import Pawn, Knight, Bishop, Rook, Queen
+# endregion imports
+
+
+# region constants
+# material values in centipawns, indexed by piece type (the Kings are never captured, so they do not count)
+PIECE_VALUES = (Pawn.strength * 100, Knight.strength * 100, Bishop.strength * 100,
+                Rook.strength * 100, Queen.strength * 100, 0)
+
+# bonuses in centipawns, indexed by piece type and by square, seen from White's side (row 0 is the 8th rank). Black
+# uses the same tables, mirrored vertically.
+PIECE_SQUARE_TABLES = {
+    PAWN: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0
+    ),
+    KNIGHT: (
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50
+    ),
+    BISHOP: (
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20
+    ),
+    ROOK: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0
+    ),
+    QUEEN: (
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20
+    ),
+    KING: (
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20
+    )
+}
+
+
+def _square_scores():
+    """
+    This function builds, for every piece code, the piece-square bonus of every square from the piece's own side (the
+    empty code scores nothing)
+
+    :return: (Tuple[Tuple[Integer]]) The bonuses, indexed by [code][square]
+    """
+    scores = []
+    for color in (WHITE, BLACK):
+        for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            table = PIECE_SQUARE_TABLES[piece_type]
+            scores.append(tuple(table[sq if color == WHITE else sq ^ 56] for sq in range(64)))  # ^ 56 flips the row
+
+    scores.append((0,) * 64)  # NO_PIECE
+    return tuple(scores)
+
+
+# indexed by piece code, NO_PIECE included
+MATERIAL_SCORES = PIECE_VALUES * 2 + (0,)
+SQUARE_SCORES = _square_scores()
+# endregion constants
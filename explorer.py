@@ -0,0 +1,219 @@
+"""
+The part of the project that deals with the opening explorer: an index of the positions of a game collection and the
+moves played from them, with their results. The index is built offline and stored as fixed-size records sorted by the
+Zobrist key of the positions, so a lookup is a binary search in the memory-mapped file and the index is never loaded
+into memory:
+
+    python explorer.py games.pgn explorer.idx
+    python explorer.py games.pgn explorer.idx --max-ply 30
+"""
+# region imports
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+import common
+from board import Move
+from pgn import REPLAY_ERRORS, read_games, replay
+# endregion imports
+
+
+# region constants
+MAGIC = b"CHSEXP01"
+HEADER = struct.Struct("<8sQ")  # magic, number of records
+RECORD = struct.Struct("<QIIII")  # Zobrist key, encoded move, white wins, draws, black wins
+KEY = struct.Struct("<Q")
+
+RESULT_INDEX = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}
+
+MAX_BUFFERED_ENTRIES = 1000000  # (position, move) pairs counted in memory before they are spilled to a sorted run
+# endregion constants
+
+
+# region build
+def write_run(entries, file):
+    """
+    This function writes counted (position, move) pairs to a file, sorted by key and move
+
+    :param entries: (Iterable[((Integer, Integer), List[Integer])]) The pairs and their white wins, draws, black wins
+    :param file: (File) The file, opened in binary mode
+    :return: (Integer) The number of records written
+    """
+    count = 0
+    for ((key, move), results) in entries:
+        file.write(RECORD.pack(key, move, *results))
+        count += 1
+    return count
+
+
+def read_run(file):
+    """
+    This function reads back a run written by write_run
+
+    :param file: (File) The file, opened in binary mode
+    :return: (Generator[((Integer, Integer), List[Integer])]) The pairs and their results
+    """
+    file.seek(0)
+    while True:
+        data = file.read(RECORD.size * 4096)
+        if not data:
+            return
+        for (key, move, white, draws, black) in RECORD.iter_unpack(data):
+            yield (key, move), [white, draws, black]
+
+
+def merge_runs(runs):
+    """
+    This function merges sorted runs and adds up the results of the pairs found in several runs
+
+    :param runs: (List[Iterable]) The sorted runs
+    :return: (Generator[((Integer, Integer), List[Integer])]) The merged pairs
+    """
+    (current, total) = (None, None)
+    for (pair, results) in heapq.merge(*runs, key=lambda entry: entry[0]):
+        if pair == current:
+            total = [a + b for (a, b) in zip(total, results)]
+            continue
+        if current is not None:
+            yield current, total
+        (current, total) = (pair, results)
+
+    if current is not None:
+        yield current, total
+
+
+def build_index(pgn_path, index_path, max_ply=None, max_entries=MAX_BUFFERED_ENTRIES, relative=False):
+    """
+    This function replays the games of a PGN file and writes the index of their positions. The counts are kept in
+    memory up to max_entries pairs, then spilled to sorted temporary runs that are merged at the end, so collections
+    of any size can be indexed.
+
+    :param pgn_path: (String) The path of the PGN file
+    :param index_path: (String) The path of the index to write
+    :param max_ply: (Integer) The number of plies indexed per game (default: all of them)
+    :param max_entries: (Integer) The number of pairs counted in memory before a run is spilled
+    :param relative: (Boolean) Count the results from the point of view of the player who made the move (wins,
+    draws, losses) instead of White's (white wins, draws, black wins)
+    :return: (Integer, Integer, Integer) The number of games indexed, the number of invalid games skipped and the
+    number of records written
+    """
+    (games, skipped, counts, runs) = (0, 0, {}, [])
+    for game in read_games(pgn_path):
+        result = RESULT_INDEX.get(game.headers.get("Result"))
+        if result is None:
+            continue
+
+        pairs = []
+        try:
+            for (ply, (board, move, _)) in enumerate(replay(game)):
+                if max_ply is not None and ply >= max_ply:
+                    break
+                pairs.append((board.get_zobrist_key(), move.encode(), board.current_color))
+        except REPLAY_ERRORS as exception:  # an invalid game is left out entirely
+            common.debug("Skipped game at byte %d: %s" % (game.offset, exception))
+            skipped += 1
+            continue
+
+        for (key, move, color) in pairs:
+            counts.setdefault((key, move), [0, 0, 0])[2 - result if relative and color == "black" else result] += 1
+        games += 1
+
+        if len(counts) >= max_entries:
+            run = tempfile.TemporaryFile()
+            write_run(sorted(counts.items()), run)
+            (counts, runs) = ({}, runs + [run])
+
+    with open(index_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, 0))
+        records = write_run(merge_runs([read_run(run) for run in runs] + [sorted(counts.items())]), file)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, records))
+
+    for run in runs:
+        run.close()
+    return games, skipped, records
+# endregion build
+
+
+# region OpeningExplorer
+class OpeningExplorer(object):
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, self.size) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or HEADER.size + self.size * RECORD.size != len(self.data):
+            raise ValueError("%s is not an opening explorer index" % path)
+
+    def key_at(self, index):
+        """
+        This method reads the key of a record
+
+        :param index: (Integer) The index of the record
+        :return: (Integer) The Zobrist key
+        """
+        return KEY.unpack_from(self.data, HEADER.size + index * RECORD.size)[0]
+
+    def lookup(self, key):
+        """
+        This method returns the moves played from a position, the most played first
+
+        :param key: (Integer) The Zobrist key of the position (Board.get_zobrist_key())
+        :return: (List[(Move, Integer, Integer, Integer)]) The moves with their white wins, draws and black wins
+        """
+        (low, high) = (0, self.size)
+        while low < high:  # the first record whose key is not smaller than the requested one
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        for index in range(low, self.size):
+            (record_key, move, white, draws, black) = RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+            if record_key != key:
+                break
+            moves.append((Move.decode(move), white, draws, black))
+
+        moves.sort(key=lambda entry: -(entry[1] + entry[2] + entry[3]))
+        return moves
+
+    def close(self):
+        """
+        This method releases the memory map and the file
+
+        :return: None
+        """
+        self.data.close()
+        self.file.close()
+# endregion OpeningExplorer
+
+
+# region main
+def main():
+    """
+    This method parses the command line and builds an index
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Build the opening explorer index of a PGN file")
+    parser.add_argument("pgn", help="PGN file")
+    parser.add_argument("index", help="index file to write")
+    parser.add_argument("--max-ply", type=int, default=None, help="plies indexed per game (default: all)")
+    arguments = parser.parse_args()
+
+    common.FLAG_DEBUG = False
+    start = time.perf_counter()
+    (games, skipped, records) = build_index(arguments.pgn, arguments.index, arguments.max_ply)
+    print("%d games (%d invalid skipped), %d records, %d bytes in %.2fs" %
+          (games, skipped, records, os.path.getsize(arguments.index), time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
+# endregion main
@@ -7,15 +7,26 @@ import os
 
 import common
 from board import Board
+from book import OpeningBook
+from engine import Engine
+from explorer import OpeningExplorer
+from pgn import to_san
+from tablebase import Tablebases
 
 
 # endregion imports
 
+ENGINE_MOVE = pygame.USEREVENT  # posted by the engine's thread when it has found its move
+
+LINE_HEIGHT = 28  # pixels between two lines of the side panel
+MAX_CACHED_TEXTS = 256  # rendered lines of the side panel kept between frames
+
 
 # region load_images
 def load_images():
     """
-    This function loads the images of all the chess pieces and returns them in dictionary form
+    This function loads the images of all the chess pieces and returns them in dictionary form, converted to the
+    pixel format of the display
     :return: Dictionary containing all the images transformed to fit the chessboard squares
     {
         "black": {<pygame.image>, ...},
@@ -28,95 +39,180 @@ def load_images():
         "white": {}
     }
     for piece in pieces:
-        dict_images["black"][piece] = pygame.transform.scale(pygame.image.load(os.path.join("pics",
-                                                                                            "black",
-                                                                                            piece + ".png")),
-                                                             (common.SQUARE_SIZE, common.SQUARE_SIZE))
-        dict_images["white"][piece] = pygame.transform.scale(pygame.image.load(os.path.join("pics",
-                                                                                            "white",
-                                                                                            piece + ".png")),
-                                                             (common.SQUARE_SIZE, common.SQUARE_SIZE))
+        for color in dict_images:
+            image = pygame.image.load(os.path.join("pics", color, piece + ".png")).convert_alpha()
+            dict_images[color][piece] = pygame.transform.scale(image, (common.SQUARE_SIZE, common.SQUARE_SIZE))
 
     return dict_images
 
 
+def load_sprites(sprites=None):
+    """
+    This function prepares everything that is drawn on the screen: the empty chessboard baked into one surface, the
+    highlight overlays, the images of the chess pieces, the areas of the squares and the font of the side panel. They
+    are only built again when SQUARE_SIZE changes, so the frames do not allocate any surface.
+
+    :param sprites: (Dict) The sprites built by a previous call, if any
+    :return: (Dict) The sprites
+    """
+    if sprites is not None and sprites["size"] == common.SQUARE_SIZE:
+        return sprites
+
+    rects = {(row, col): pygame.Rect(col * common.SQUARE_SIZE, row * common.SQUARE_SIZE,
+                                     common.SQUARE_SIZE, common.SQUARE_SIZE)
+             for row in range(common.DIMENSION) for col in range(common.DIMENSION)}
+
+    colors = [pygame.Color(235, 235, 208), pygame.Color(119, 148, 85)]
+    empty_board = pygame.Surface((common.WIDTH, common.HEIGHT)).convert()
+    for ((row, col), rect) in rects.items():
+        empty_board.fill(colors[(row + col) % 2], rect)
+
+    highlighted_square = pygame.Surface((common.SQUARE_SIZE, common.SQUARE_SIZE), pygame.SRCALPHA, 32).convert_alpha()
+    highlighted_square.fill((246, 246, 130, 150))  # yellow
+
+    check_square = pygame.Surface((common.SQUARE_SIZE, common.SQUARE_SIZE), pygame.SRCALPHA, 32).convert_alpha()
+    check_square.fill((219, 21, 7, 200))  # red
+
+    return {
+        "size": common.SQUARE_SIZE,
+        "rects": rects,
+        "empty_board": empty_board,
+        "highlighted_square": highlighted_square,
+        "check_square": check_square,
+        "pieces": load_images(),
+        "font": pygame.font.Font(None, 32),
+        "texts": {}  # the rendered lines of the side panel
+    }
+
+
 # endregion load_images
 
 
 # region redraw_game_state
-def redraw_game_state(screen, board, dict_images):
+def redraw_game_state(screen, board, sprites, panel_lines, drawn):
     """
-    This method draws the current state of the chessboard
+    This method draws the parts of the window that changed since the last call and updates only those on the display
 
     :param screen: (pygame.display) Pygame module to control the display window and screen
     :param board: (Dict{8, 8}) The current state of the chess pieces on the board
-    :param dict_images: (Dict{"black": {}, "white": {}}) Dictionary containing the images of the chess pieces
+    :param sprites: (Dict) The surfaces built by load_sprites
+    :param panel_lines: (Tuple[String]) The lines of text shown in the side panel (the engine's status, the opening
+    explorer)
+    :param drawn: (Dict) What is currently on the screen: the state of every square and the lines of the panel
+    (empty before the first call)
     :return: Boolean (True or False)
     """
-    redraw_empty_board(screen, board)
-    redraw_board_instance(screen, board, dict_images)
+    if drawn.get("sprites") is not sprites:  # the sprites were rebuilt, everything has to be drawn again
+        drawn.clear()
+        drawn["sprites"] = sprites
+
+    dirty_squares = find_dirty_squares(board, drawn)
+    redraw_empty_board(screen, sprites, dirty_squares)
+    redraw_board_instance(screen, board, sprites, dirty_squares, drawn)
 
-    pygame.display.update()
+    rects = [sprites["rects"][position] for position in dirty_squares]
+    if drawn.get("panel") != panel_lines:
+        drawn["panel"] = panel_lines
+        rects.append(redraw_side_panel(screen, sprites, panel_lines))
+
+    if rects:
+        pygame.display.update(rects)
     return True
 
 
-def redraw_empty_board(screen, board):
+def find_dirty_squares(board, drawn):
     """
-    This method draws an empty chessboard
+    This method compares every square with what is on the screen (the piece, the highlight of a selection or of a
+    valid move, the highlight of a check) and returns the squares that have to be redrawn
 
-    :param screen: (pygame.display) Pygame module to control the display window and screen
     :param board: (Dict{8, 8}) The current state of the chess pieces on the board
-    :return: None
+    :param drawn: (Dict) What is currently on the screen; it is updated with the new state of the dirty squares
+    :return: (List[(Integer, Integer)]) The positions of the squares to redraw
     """
-    colors = [pygame.Color(235, 235, 208), pygame.Color(119, 148, 85)]
+    from piece import King
+    highlighted = set()
+    for row in range(board.rows):
+        for col in range(board.cols):
+            piece = board.get_piece((row, col))
+            if piece.is_selected:
+                highlighted.add((row, col))
+                highlighted.update(piece.valid_moves)
+
+    dirty_squares = []
     for row in range(board.rows):
         for col in range(board.cols):
-            color = colors[(row + col) % 2]
-            pygame.draw.rect(screen, color, pygame.Rect(col * common.SQUARE_SIZE, row * common.SQUARE_SIZE,
-                                                        common.SQUARE_SIZE, common.SQUARE_SIZE))
+            piece = board.get_piece((row, col))
+            state = (piece.color, piece.name, (row, col) in highlighted, isinstance(piece, King) and piece.is_in_check)
+            if drawn.get((row, col)) != state:
+                drawn[row, col] = state
+                dirty_squares.append((row, col))
 
+    return dirty_squares
 
-def redraw_board_instance(screen, board, dict_images):
+
+def redraw_empty_board(screen, sprites, squares):
     """
-    This method draws the remaining chess pieces on the empty board
+    This method draws the empty chessboard squares, copied from the pre-rendered chessboard
+
+    :param screen: (pygame.display) Pygame module to control the display window and screen
+    :param sprites: (Dict) The surfaces built by load_sprites
+    :param squares: (List[(Integer, Integer)]) The positions of the squares to draw
+    :return: None
+    """
+    for position in squares:
+        rect = sprites["rects"][position]
+        screen.blit(sprites["empty_board"], rect, rect)
+
+
+def redraw_board_instance(screen, board, sprites, squares, drawn):
+    """
+    This method draws the highlights and the chess pieces of some squares of the board
 
     :param screen: (pygame.display) Pygame module to control the display window and screen
     :param board: (Dict{8, 8}) The current state of the chess pieces on the board
-    :param dict_images: (Dict{"black": [], "white": []}) Dictionary containing the images of the chess pieces
+    :param sprites: (Dict) The surfaces built by load_sprites
+    :param squares: (List[(Integer, Integer)]) The positions of the squares to draw
+    :param drawn: (Dict) The state of every square, as computed by find_dirty_squares
     :return: None
     """
-    from piece import Empty, King
-    highlighted_square = pygame.Surface((common.SQUARE_SIZE, common.SQUARE_SIZE), pygame.SRCALPHA, 32)
-    highlighted_square.fill((246, 246, 130, 150))  # yellow
+    from piece import Empty
+    for position in squares:
+        piece = board.get_piece(position)
+        rect = sprites["rects"][position]
+        (_, _, is_highlighted, is_in_check) = drawn[position]
 
-    check_square = pygame.Surface((common.SQUARE_SIZE, common.SQUARE_SIZE), pygame.SRCALPHA, 32)
-    check_square.fill((219, 21, 7, 200))  # red
+        if is_highlighted:  # highlight the selected piece and its valid moves
+            screen.blit(sprites["highlighted_square"], rect)
 
-    for row in range(board.rows):
-        for col in range(board.cols):
-            piece = board.get_piece((row, col))
+        if is_in_check:
+            screen.blit(sprites["check_square"], rect)
 
-            if piece.is_selected:  # highlight selected piece position
-                screen.blit(highlighted_square,
-                            pygame.Rect(col * common.SQUARE_SIZE, row * common.SQUARE_SIZE,
-                                        common.SQUARE_SIZE, common.SQUARE_SIZE))
+        if not isinstance(piece, Empty):
+            screen.blit(sprites["pieces"][piece.color][piece.name], rect)
 
-                board.update_valid_moves()
-                for move in board.get_piece((row, col)).valid_moves:  # highlight valid moves of selected piece
-                    screen.blit(highlighted_square,
-                                pygame.Rect(move[1] * common.SQUARE_SIZE, move[0] * common.SQUARE_SIZE,
-                                            common.SQUARE_SIZE, common.SQUARE_SIZE))
 
-            if isinstance(piece, King) and piece.is_in_check:
-                screen.blit(check_square,
-                            pygame.Rect(col * common.SQUARE_SIZE, row * common.SQUARE_SIZE,
-                                        common.SQUARE_SIZE, common.SQUARE_SIZE))
+def redraw_side_panel(screen, sprites, panel_lines):
+    """
+    This method draws the panel on the right side of the chessboard
+
+    :param screen: (pygame.display) Pygame module to control the display window and screen
+    :param sprites: (Dict) The surfaces built by load_sprites
+    :param panel_lines: (Tuple[String]) The lines of text shown in the panel
+    :return: (pygame.Rect) The area of the panel
+    """
+    panel = pygame.Rect(common.WIDTH, 0, common.GAME_WIDTH - common.WIDTH, common.HEIGHT)
+    screen.fill(pygame.Color("white"), panel)
 
-            # if isinstance(piece, King) and board
-            if not isinstance(piece, Empty):
-                screen.blit(dict_images[piece.color][piece.name],
-                            pygame.Rect(col * common.SQUARE_SIZE, row * common.SQUARE_SIZE,
-                                        common.SQUARE_SIZE, common.SQUARE_SIZE))
+    texts = sprites["texts"]
+    if len(texts) > MAX_CACHED_TEXTS:
+        texts.clear()
+    for (index, line) in enumerate(panel_lines):
+        if not line:
+            continue
+        if line not in texts:
+            texts[line] = sprites["font"].render(line, True, pygame.Color("black")).convert_alpha()
+        screen.blit(texts[line], (common.WIDTH + 20, 20 + index * LINE_HEIGHT))
+    return panel
 
 
 # endregion redraw_game_state
@@ -145,6 +241,154 @@ def click_on_chessboard(mouse_position):
 # endregion click_on_chessboard
 
 
+# region play_move
+def play_move(board, last_position, next_position, promotion=None):
+    """
+    This method plays a move on the board and hands the turn over to the other player
+
+    :param board: (Board) The current state of the chess pieces on the board
+    :param last_position: (Integer, Integer) The last position of the moved chess piece
+    :param next_position: (Integer, Integer) The next position of the moved chess piece
+    :param promotion: (String) The name of the piece a Pawn is promoted to (Queen by default)
+    :return: None
+    """
+    board.move(last_position, next_position, promotion)
+    board.update_king_position(last_position, next_position)
+    board.is_in_check()
+    board.update_current_color()
+
+
+def is_engine_turn(board):
+    """
+    This method determines whether or not the computer has to play the next move
+
+    :param board: (Board) The current state of the chess pieces on the board
+    :return: Boolean (True or False)
+    """
+    return common.GAME_MODE == common.GameMode.SINGLE_PLAYER and board.current_color != common.HUMAN_COLOR
+
+
+def post_engine_move(move, search, key):
+    """
+    This method hands the engine's move over to the pygame loop. It is called from the engine's thread.
+
+    :param move: (Move) The move found by the engine (None if there is no legal move)
+    :param search: (Search) The search that found it
+    :param key: (Integer) The Zobrist key of the searched position, so that an outdated move can be recognized
+    :return: None
+    """
+    pygame.event.post(pygame.event.Event(ENGINE_MOVE, move=move, key=key, depth=search.depth,
+                                         nps=search.nodes_per_second()))
+
+
+def load_book():
+    """
+    This method opens the engine's opening book, if there is one
+
+    :return: (OpeningBook) The book, or None
+    """
+    if not common.BOOK_PATH or not os.path.exists(common.BOOK_PATH):
+        return None
+
+    try:
+        return OpeningBook(common.BOOK_PATH)
+    except ValueError as exception:
+        common.debug(str(exception))
+        return None
+
+
+# endregion play_move
+
+
+# region explorer
+def load_explorer():
+    """
+    This method opens the opening explorer index, if there is one
+
+    :return: (OpeningExplorer) The index, or None
+    """
+    if not common.EXPLORER_PATH or not os.path.exists(common.EXPLORER_PATH):
+        return None
+
+    try:
+        return OpeningExplorer(common.EXPLORER_PATH)
+    except ValueError as exception:
+        common.debug(str(exception))
+        return None
+
+
+def explorer_lines(board, explorer):
+    """
+    This method describes the moves played from the current position in the games of the opening explorer
+
+    :param board: (Board) The current state of the chess pieces on the board
+    :param explorer: (OpeningExplorer) The index (None if there is no index)
+    :return: (Tuple[String]) The lines of the side panel, e.g. "e4   1520   38% / 31% / 31%"
+    """
+    if explorer is None:
+        return ()
+
+    legal_moves = board.generate_legal_moves()
+    lines = ["Opening explorer"]
+    for (move, white, draws, black) in explorer.lookup(board.get_zobrist_key()):
+        if len(lines) > common.EXPLORER_MOVES:
+            break
+        if move not in legal_moves:  # the key of another position
+            continue
+
+        games = white + draws + black
+        lines.append("%s   %d   %d%% / %d%% / %d%%" % (to_san(board, move, legal_moves), games, 100 * white // games,
+                                                      100 * draws // games, 100 * black // games))
+
+    return tuple(lines) if len(lines) > 1 else ()
+
+
+def tablebase_lines(board, tablebases):
+    """
+    This method describes the exact result of the current position, if it is in the endgame tables
+
+    :param board: (Board) The current state of the chess pieces on the board
+    :param tablebases: (Tablebases) The endgame tables
+    :return: (Tuple[String]) The lines of the side panel, e.g. "White mates in 12"
+    """
+    probe = tablebases.probe(board)
+    if probe is None:
+        return ()
+    if probe.result == 0:
+        return "Tablebase", "Draw"
+
+    winner = board.current_color if probe.result > 0 else ("black" if board.current_color == "white" else "white")
+    return "Tablebase", "%s mates in %d" % (winner.capitalize(), (probe.plies + 1) // 2)
+
+
+# endregion explorer
+
+
+# region wait_for_events
+def wait_for_events(clock, busy):
+    """
+    This method waits for the next events. In the event-driven mode the loop sleeps until an event arrives, but it
+    still wakes up MAX_FPS times per second while background work (e.g. the engine thinking) is going on; otherwise it
+    polls at MAX_FPS.
+
+    :param clock: (pygame.time.Clock) The clock that caps the frame rate
+    :param busy: Boolean (True if background work needs regular frames)
+    :return: (List[pygame.event.Event]) The events
+    """
+    clock.tick(common.MAX_FPS)
+    if not common.EVENT_DRIVEN:
+        return pygame.event.get()
+
+    event = pygame.event.wait(1000 // common.MAX_FPS if busy else common.EVENT_WAIT_TIMEOUT)
+    events = pygame.event.get()
+    if event.type != pygame.NOEVENT:
+        events.insert(0, event)
+    return events
+
+
+# endregion wait_for_events
+
+
 # region main
 def main():
     """
@@ -165,39 +409,65 @@ def main():
 
     screen.fill(pygame.Color("white"))
 
-    dict_images = load_images()
+    sprites = load_sprites()
     position = False
+    engine = Engine()
+    engine_position = None  # the Zobrist key of the last position given to the engine
+    book = load_book()
+    drawn = {}  # what is currently on the screen, so that only the squares that change are redrawn
+    explorer = load_explorer()
+    tablebases = Tablebases()
+    explorer_panel = (None, ())  # the Zobrist key of the position described by the explorer lines, and the lines
+    caption_color = board.current_color  # the player to move shown in the caption
 
     run = True
     while run:
-        clock.tick(common.MAX_FPS)
-        if not redraw_game_state(screen, board, dict_images):
+        if is_engine_turn(board) and not engine.is_thinking() and engine_position != board.get_zobrist_key():
+            engine_position = board.get_zobrist_key()
+            book_move = book.choose(board) if book is not None else None
+            if book_move is not None:  # no need to search
+                pygame.event.post(pygame.event.Event(ENGINE_MOVE, move=book_move, key=engine_position, depth=0, nps=0))
+            else:
+                engine.think(board, lambda move, search, key=engine_position: post_engine_move(move, search, key))
+
+        if explorer_panel[0] != board.get_zobrist_key():
+            explorer_panel = (board.get_zobrist_key(),
+                              explorer_lines(board, explorer) + tablebase_lines(board, tablebases))
+
+        sprites = load_sprites(sprites)
+        panel_lines = ("Thinking..." if engine.is_thinking() else "",) + explorer_panel[1]
+        if not redraw_game_state(screen, board, sprites, panel_lines, drawn):
             run = False
             pygame.quit()
 
-        pygame.display.set_caption(common.TITLE + " (\"" + board.current_color.capitalize() + "\" to move)")
-        for event in pygame.event.get():
+        if caption_color != board.current_color:
+            caption_color = board.current_color
+            pygame.display.set_caption(common.TITLE + " (\"" + board.current_color.capitalize() + "\" to move)")
+
+        for event in wait_for_events(clock, engine.is_thinking()):
             if event.type == pygame.QUIT:
                 run = False
+                engine.close()
                 pygame.quit()
 
+            if event.type == ENGINE_MOVE and event.move is not None and event.key == board.get_zobrist_key():
+                play_move(board, *event.move)
+                board.cancel()
+                position = False
+                common.debug("Engine: %s (depth %d, %d nps)" % (event.move, event.depth, event.nps))
+
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_current_position = pygame.mouse.get_pos()
                 last_position = position
                 position = click_on_chessboard(mouse_current_position)
 
                 if position is not False:
-                    board.update_valid_moves()
-                    # board.filter_valid_moves()
                     board.select(position)
                     common.debug("Position: (%d, %d)" % (position[0], position[1]))
 
                 if position is not False and last_position is not False:
-                    if board.is_move_valid(last_position, position):
-                        board.move(last_position, position)
-                        board.update_king_position(last_position, position)
-                        board.is_in_check()
-                        board.update_current_color()
+                    if not is_engine_turn(board) and board.is_move_valid(last_position, position):
+                        play_move(board, last_position, position)
 
                     board.cancel()
                     position = False
@@ -0,0 +1,449 @@
+"""
+The part of the project that plays engine configurations against each other, headless (without pygame). The games
+are spread over a process pool, every opening is played with both colors, finished games are appended to a PGN file
+as soon as they end (so an interrupted match can be resumed), and the result is reported as an Elo difference with its
+95% error bars, or as an SPRT verdict:
+
+    python match.py --engine name=depth3,depth=3 --engine name=depth4,depth=4 --games 100 --movetime 0.1
+    python match.py --engine name=base --engine name=big,hash=64 --tc 10+0.1 --openings book.pgn --sprt 0,10
+"""
+# region imports
+import argparse
+import datetime
+import math
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import common
+from bitboard import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, popcount
+from board import Board, START_FEN
+from pgn import REPLAY_ERRORS, read_games, replay, format_game, to_san
+from search import Search, MATE, MAX_PLY
+from transposition import TranspositionTable
+# endregion imports
+
+
+# region constants
+EngineConfig = namedtuple("EngineConfig", ["name", "max_depth", "hash_size_mb"])
+TimeControl = namedtuple("TimeControl", ["base", "increment", "movetime"])
+Adjudication = namedtuple("Adjudication", ["resign_score", "resign_moves", "draw_score", "draw_moves", "draw_after",
+                                           "max_plies"])
+
+MOVES_TO_GO = 30  # moves the remaining time of a clock is shared between
+MAX_RETRIES = 2  # times a game is restarted after its worker crashed
+SPRT_MIN_GAMES = 20  # games before the SPRT may stop a match (the variance estimate of fewer games is unreliable)
+# endregion constants
+
+
+# region game
+def has_insufficient_material(board):
+    """
+    This function determines whether or not neither player can checkmate: only Kings, with at most one Knight or
+    Bishop left on the board
+
+    :param board: (Board) The position
+    :return: Boolean (True or False)
+    """
+    pieces = board.bitboard.pieces
+    for color in (0, 6):
+        if pieces[color + PAWN] or pieces[color + ROOK] or pieces[color + QUEEN]:
+            return False
+
+    minors = sum(popcount(pieces[color + piece_type]) for color in (0, 6) for piece_type in (KNIGHT, BISHOP))
+    return minors <= 1
+
+
+def play_game(task):
+    """
+    This function plays one game between two engine configurations, in a worker process
+
+    :param task: (Tuple) The round, the FEN of the opening, the configurations of White and Black, the time control
+    and the adjudication rules
+    :return: (Integer, String, String) The round, the result and the game in PGN
+    """
+    (game_round, fen, configs, time_control, adjudication) = task
+    common.FLAG_DEBUG = False
+
+    board = Board.from_fen(fen)
+    tables = [TranspositionTable(config.hash_size_mb) for config in configs]
+    clocks = [time_control.base, time_control.base]
+    first_color = board.current_color
+    fullmove_number = board.fullmove_number
+    repetitions = {board.get_zobrist_key(): 1}
+    (sans, result, termination) = ([], None, "normal")
+    (resign_plies, draw_plies) = (0, 0)  # consecutive plies with a winning (for White if > 0) or drawn score
+
+    while result is None:
+        legal_moves = board.generate_legal_moves()
+        if not legal_moves:
+            if board.in_check():
+                result = "0-1" if board.current_color == "white" else "1-0"
+            else:
+                result = "1/2-1/2"
+            break
+
+        side = 0 if board.current_color == "white" else 1
+        if time_control.movetime:
+            time_limit = time_control.movetime
+        else:
+            time_limit = clocks[side] / MOVES_TO_GO + time_control.increment
+
+        search = Search(board, time_limit, configs[side].max_depth, tables[side])
+        start = time.perf_counter()
+        move = search.search()
+        if not time_control.movetime:
+            clocks[side] -= time.perf_counter() - start
+            if clocks[side] < 0:
+                (result, termination) = ("0-1" if side == 0 else "1-0", "time forfeit")
+                break
+            clocks[side] += time_control.increment
+
+        score = search.best_score if side == 0 else -search.best_score  # from White's point of view
+        sans.append(to_san(board, move, legal_moves))
+        board.make_move(move)
+
+        key = board.get_zobrist_key()
+        repetitions[key] = repetitions.get(key, 0) + 1
+        if repetitions[key] >= 3 or board.halfmove_clock >= 100 or has_insufficient_material(board):
+            result = "1/2-1/2"
+            break
+        if abs(score) >= MATE - MAX_PLY:  # the engines play mates out
+            (resign_plies, draw_plies) = (0, 0)
+            continue
+
+        # adjudication: a score both engines keep agreeing on
+        if score >= adjudication.resign_score:  # the sign of the streak tells which side is winning
+            resign_plies = resign_plies + 1 if resign_plies > 0 else 1
+        elif score <= -adjudication.resign_score:
+            resign_plies = resign_plies - 1 if resign_plies < 0 else -1
+        else:
+            resign_plies = 0
+        draw_plies = draw_plies + 1 if abs(score) <= adjudication.draw_score and \
+            len(sans) >= adjudication.draw_after else 0
+        if abs(resign_plies) >= 2 * adjudication.resign_moves:
+            (result, termination) = ("1-0" if resign_plies > 0 else "0-1", "adjudication")
+        elif draw_plies >= 2 * adjudication.draw_moves or len(sans) >= adjudication.max_plies:
+            (result, termination) = ("1/2-1/2", "adjudication")
+
+    headers = {
+        "Event": "Engine match",
+        "Site": "?",
+        "Date": datetime.date.today().strftime("%Y.%m.%d"),
+        "Round": game_round,
+        "White": configs[0].name,
+        "Black": configs[1].name,
+        "Result": result,
+        "Termination": termination
+    }
+    if fen != START_FEN:
+        (headers["SetUp"], headers["FEN"]) = ("1", fen)
+
+    return game_round, result, format_game(headers, sans, result, first_color, fullmove_number)
+# endregion game
+
+
+# region statistics
+def expected_score(elo):
+    """
+    This function converts an Elo difference to the expected score
+
+    :param elo: (Float) The Elo difference
+    :return: (Float) The expected score, between 0 and 1
+    """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_difference(score):
+    """
+    This function converts a score to the Elo difference that is expected to produce it
+
+    :param score: (Float) The score, between 0 and 1 (excluded)
+    :return: (Float) The Elo difference
+    """
+    return 400 * math.log10(score / (1 - score))
+
+
+def score_statistics(wins, draws, losses):
+    """
+    This function computes the mean score of a match and the variance of the score of one game
+
+    :param wins: (Integer) The number of wins
+    :param draws: (Integer) The number of draws
+    :param losses: (Integer) The number of losses
+    :return: (Float, Float) The mean score and the variance
+    """
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    return score, variance
+
+
+def elo_interval(wins, draws, losses):
+    """
+    This function estimates the Elo difference of a match and its 95% confidence interval
+
+    :param wins: (Integer) The number of wins
+    :param draws: (Integer) The number of draws
+    :param losses: (Integer) The number of losses
+    :return: (Float, Float, Float) The Elo difference and the bounds of the interval (infinite when the score is 0
+    or 1)
+    """
+    (score, variance) = score_statistics(wins, draws, losses)
+    margin = 1.96 * math.sqrt(variance / (wins + draws + losses))
+
+    def to_elo(value):
+        if value <= 0:
+            return -math.inf
+        if value >= 1:
+            return math.inf
+        return elo_difference(value)
+
+    return to_elo(score), to_elo(score - margin), to_elo(score + margin)
+
+
+def sprt(wins, draws, losses, elo0, elo1, alpha=0.05, beta=0.05):
+    """
+    This function runs a sequential probability ratio test between the hypotheses "the Elo difference is elo0" and
+    "the Elo difference is elo1" (normal approximation of the log-likelihood ratio)
+
+    :param wins: (Integer) The number of wins
+    :param draws: (Integer) The number of draws
+    :param losses: (Integer) The number of losses
+    :param elo0: (Float) The Elo difference of the null hypothesis
+    :param elo1: (Float) The Elo difference of the alternative hypothesis
+    :param alpha: (Float) The probability of accepting elo1 when elo0 is true
+    :param beta: (Float) The probability of accepting elo0 when elo1 is true
+    :return: (Float, Float, Float, String) The log-likelihood ratio, its bounds and the verdict ("H0", "H1" or None)
+    """
+    (lower, upper) = (math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha))
+    (score, variance) = score_statistics(wins, draws, losses)
+    if variance == 0:
+        return 0.0, lower, upper, None
+
+    (score0, score1) = (expected_score(elo0), expected_score(elo1))
+    llr = (wins + draws + losses) * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+    verdict = None
+    if wins + draws + losses >= SPRT_MIN_GAMES:
+        verdict = "H1" if llr >= upper else "H0" if llr <= lower else None
+    return llr, lower, upper, verdict
+# endregion statistics
+
+
+# region match
+def load_openings(path, plies):
+    """
+    This function reads the start positions of a match: the FEN of every line of a text file, or the position reached
+    after a number of plies of every game of a PGN file
+
+    :param path: (String) The path of the file (None for the standard start position only)
+    :param plies: (Integer) The plies played from every PGN game
+    :return: (List[String]) The FEN of the start positions
+    """
+    if path is None:
+        return [START_FEN]
+
+    if not path.lower().endswith(".pgn"):
+        with open(path) as file:
+            return [Board.from_fen(line).to_fen() for line in file if line.strip() and not line.startswith("#")]
+
+    openings = []
+    for game in read_games(path):
+        try:
+            board = Board.from_fen(game.headers.get("FEN", START_FEN))
+            for (ply, (board, _, _)) in enumerate(replay(game)):  # the replay plays every move once it is resumed
+                if ply >= plies:
+                    break
+        except REPLAY_ERRORS as exception:
+            print("Opening at byte %d skipped: %s" % (game.offset, exception))
+            continue
+        openings.append(board.to_fen())
+    return openings
+
+
+def parse_engine(text):
+    """
+    This function reads an engine configuration from the command line, e.g. "name=new,depth=6,hash=32"
+
+    :param text: (String) The comma separated options
+    :return: (EngineConfig) The configuration
+    """
+    options = dict(option.split("=", 1) for option in text.split(",") if option)
+    return EngineConfig(options.get("name", text), int(options.get("depth", common.ENGINE_MAX_DEPTH)),
+                        int(options.get("hash", 4)))
+
+
+def completed_rounds(path):
+    """
+    This function reads the games already stored in the output file of a match
+
+    :param path: (String) The path of the PGN file
+    :return: (Dict{Integer: (String, String)}) The White player and the result of every completed round
+    """
+    if not os.path.exists(path):
+        return {}
+    return {int(game.headers["Round"]): (game.headers.get("White"), game.headers.get("Result"))
+            for game in read_games(path) if game.headers.get("Round", "").isdigit()}
+
+
+def run_match(engines, games, openings, time_control, adjudication, output, workers, sprt_bounds=None):
+    """
+    This function plays a match between two engine configurations and reports the result of the first one. When a
+    worker crashes, the pool is started again and the unfinished games are played again.
+
+    :param engines: (EngineConfig, EngineConfig) The configurations
+    :param games: (Integer) The number of games
+    :param openings: (List[String]) The FEN of the start positions (each one is played with both colors)
+    :param time_control: (TimeControl) The time control
+    :param adjudication: (Adjudication) The adjudication rules
+    :param output: (String) The path of the PGN file the games are appended to
+    :param workers: (Integer) The number of processes
+    :param sprt_bounds: (Float, Float) The Elo differences of the SPRT hypotheses (None for no SPRT)
+    :return: (Integer, Integer, Integer) The wins, draws and losses of the first configuration
+    """
+    counts = {"1-0": 0, "1/2-1/2": 0, "0-1": 0}  # from the first configuration's point of view
+    flipped = {"1-0": "0-1", "1/2-1/2": "1/2-1/2", "0-1": "1-0"}
+
+    def record(white, result):
+        if result in counts:
+            counts[result if white == engines[0].name else flipped[result]] += 1
+
+    done = completed_rounds(output)
+    for (white, result) in done.values():
+        record(white, result)
+
+    pending = {}
+    for game_round in range(1, games + 1):
+        if game_round not in done:
+            configs = engines if game_round % 2 else engines[::-1]
+            fen = openings[(game_round - 1) // 2 % len(openings)]
+            pending[game_round] = (game_round, fen, configs, time_control, adjudication)
+
+    retries = dict.fromkeys(pending, 0)
+
+    def retry(game_round):
+        retries[game_round] += 1
+        if retries[game_round] > MAX_RETRIES:
+            print("Round %d dropped after %d failures" % (game_round, MAX_RETRIES))
+            del pending[game_round]
+            return False
+        return True
+    start = time.perf_counter()
+    with open(output, "a") as file:
+        while pending:
+            try:
+                with ProcessPoolExecutor(workers) as executor:
+                    futures = {executor.submit(play_game, task): game_round for (game_round, task) in pending.items()}
+                    while futures:
+                        (finished, _) = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            game_round = futures.pop(future)
+                            try:
+                                (_, result, text) = future.result()
+                            except BrokenProcessPool:
+                                raise
+                            except Exception as exception:  # a bug in the game: play it again
+                                print("Round %d failed: %r" % (game_round, exception))
+                                if retry(game_round):
+                                    futures[executor.submit(play_game, pending[game_round])] = game_round
+                                continue
+                            del pending[game_round]
+
+                            file.write(text)
+                            file.flush()
+                            record(white_player(engines, game_round), result)
+                            report(counts, sprt_bounds, time.perf_counter() - start)
+
+                        if sprt_bounds is not None and sprt(counts["1-0"], counts["1/2-1/2"], counts["0-1"],
+                                                            *sprt_bounds)[3] is not None:
+                            executor.shutdown(cancel_futures=True)
+                            return counts["1-0"], counts["1/2-1/2"], counts["0-1"]
+            except BrokenProcessPool:
+                for game_round in list(pending):
+                    retry(game_round)
+                print("A worker crashed, %d games are played again" % len(pending))
+
+    return counts["1-0"], counts["1/2-1/2"], counts["0-1"]
+
+
+def white_player(engines, game_round):
+    """
+    This function returns the name of the configuration that plays White in a round
+
+    :param engines: (EngineConfig, EngineConfig) The configurations
+    :param game_round: (Integer) The round
+    :return: (String) The name
+    """
+    return engines[0].name if game_round % 2 else engines[1].name
+
+
+def report(counts, sprt_bounds, elapsed):
+    """
+    This function prints the standing of a match
+
+    :param counts: (Dict{String: Integer}) The wins ("1-0"), draws and losses ("0-1") of the first configuration
+    :param sprt_bounds: (Float, Float) The Elo differences of the SPRT hypotheses (None for no SPRT)
+    :param elapsed: (Float) The seconds since the match started
+    :return: None
+    """
+    (wins, draws, losses) = (counts["1-0"], counts["1/2-1/2"], counts["0-1"])
+    (elo, low, high) = elo_interval(wins, draws, losses)
+    line = "games %d  +%d =%d -%d  elo %.1f [%.1f, %.1f]  %.1fs" % (wins + draws + losses, wins, draws, losses, elo,
+                                                                  low, high, elapsed)
+    if sprt_bounds is not None:
+        (llr, lower, upper, verdict) = sprt(wins, draws, losses, *sprt_bounds)
+        line += "  llr %.2f [%.2f, %.2f]%s" % (llr, lower, upper, "  accepted " + verdict if verdict else "")
+    print(line)
+# endregion match
+
+
+# region main
+def main():
+    """
+    This method parses the command line and plays a match
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Play a match between two engine configurations")
+    parser.add_argument("--engine", action="append", required=True,
+                        help="engine configuration, e.g. name=new,depth=6,hash=32 (twice)")
+    parser.add_argument("--games", type=int, default=100, help="number of games (default: 100)")
+    parser.add_argument("--movetime", type=float, default=None, help="seconds per move")
+    parser.add_argument("--tc", default="10+0.1", help="base seconds + increment per game (default: 10+0.1)")
+    parser.add_argument("--openings", default=None, help="FEN file or PGN file of start positions")
+    parser.add_argument("--opening-plies", type=int, default=8, help="plies played from every PGN opening")
+    parser.add_argument("--output", default="match.pgn", help="PGN file the games are appended to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of processes")
+    parser.add_argument("--sprt", default=None, help="Elo differences of the SPRT hypotheses, e.g. 0,10")
+    parser.add_argument("--resign-score", type=int, default=1000, help="centipawns of a lost position")
+    parser.add_argument("--resign-moves", type=int, default=4, help="moves the resign score has to last")
+    parser.add_argument("--draw-score", type=int, default=10, help="centipawns of a drawn position")
+    parser.add_argument("--draw-moves", type=int, default=8, help="moves the draw score has to last")
+    parser.add_argument("--draw-after", type=int, default=80, help="plies before a draw can be adjudicated")
+    parser.add_argument("--max-plies", type=int, default=400, help="plies after which the game is drawn")
+    arguments = parser.parse_args()
+
+    if len(arguments.engine) != 2:
+        common.error("Exactly two engine configurations are needed")
+    engines = tuple(parse_engine(text) for text in arguments.engine)
+    if engines[0].name == engines[1].name:
+        common.error("The engine configurations need different names")
+
+    (base, increment) = (float(value) for value in (arguments.tc.split("+") + ["0"])[:2])
+    time_control = TimeControl(base, increment, arguments.movetime)
+    adjudication = Adjudication(arguments.resign_score, arguments.resign_moves, arguments.draw_score,
+                                arguments.draw_moves, arguments.draw_after, arguments.max_plies)
+    sprt_bounds = tuple(float(value) for value in arguments.sprt.split(",")) if arguments.sprt else None
+
+    common.FLAG_DEBUG = False
+    openings = load_openings(arguments.openings, arguments.opening_plies)
+    (wins, draws, losses) = run_match(engines, arguments.games, openings, time_control, adjudication,
+                                      arguments.output, arguments.workers, sprt_bounds)
+    print("%s vs %s: +%d =%d -%d" % (engines[0].name, engines[1].name, wins, draws, losses))
+
+
+if __name__ == "__main__":
+    main()
+# endregion main
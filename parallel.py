@@ -0,0 +1,275 @@
+"""
+The part of the project that spreads the engine's search over several processes. Every iteration of the iterative
+deepening searches the best move of the previous iteration first, in the current process, then splits the other root
+moves between the workers of a process pool (root splitting). The positions are sent as the 35 bytes of Board.pack().
+It can be benchmarked headless (without pygame):
+
+    python parallel.py --depth 4 --workers 4
+    python parallel.py --depth 5 --workers 8 --fen "<FEN>"
+"""
+# region imports
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+
+import common
+from board import Board, Move, START_FEN
+from search import Search, INFINITY, MATE, MAX_PLY, TIME_CHECK_INTERVAL, tablebase_score
+from transposition import TranspositionTable
+# endregion imports
+
+
+# region worker
+# every worker keeps its transposition table between the tasks of a search (and between the searches)
+worker_table = None
+worker_search_id = None
+worker_board = (None, None)  # the last packed position and its board, so a search unpacks it only once
+stop_event = None  # set by the main process to stop all the workers (shared with them through the initializer)
+
+
+class WorkerSearch(Search):
+    def is_out_of_time(self):
+        """
+        This method also stops the search when the main process sets the stop event
+
+        :return: Boolean (True if the search has to stop)
+        """
+        if Search.is_out_of_time(self):
+            return True
+        if self.nodes % TIME_CHECK_INTERVAL == 0 and stop_event.is_set():
+            self.stopped = True
+        return self.stopped
+
+
+def init_worker(hash_size_mb, event):
+    """
+    This function prepares a worker process of the pool
+
+    :param hash_size_mb: (Integer) The memory budget of the worker's transposition table
+    :param event: (multiprocessing.Event) The stop event
+    :return: None
+    """
+    global worker_table, stop_event
+    common.FLAG_DEBUG = False
+    worker_table = TranspositionTable(hash_size_mb)
+    stop_event = event
+
+
+def search_root_move(task):
+    """
+    This function searches one root move in a worker process
+
+    :param task: (Tuple) The packed position, the encoded move, the depth, the alpha bound, the deadline (wall clock
+    seconds) and the id of the search
+    :return: (Integer, Integer, Integer) The encoded move, its score (None if the time ran out) and the nodes searched
+    """
+    global worker_search_id, worker_board
+    (packed, code, depth, alpha, deadline, search_id) = task
+    time_limit = deadline - time.time()
+    if time_limit <= 0 or stop_event.is_set():  # the task waited in the queue until the search was over
+        return code, None, 0
+
+    if search_id != worker_search_id:
+        worker_table.new_search()
+        worker_search_id = search_id
+    if worker_board[0] != packed:
+        worker_board = (packed, Board.unpack(packed))
+
+    search = WorkerSearch(worker_board[1], table=worker_table)
+    score = search.search_move(Move.decode(code), depth, alpha, time_limit)
+    return code, score, search.nodes
+# endregion worker
+
+
+# region ParallelSearch
+search_ids = itertools.count()
+
+
+def create_pool(workers=None, hash_size_mb=None):
+    """
+    This function starts the worker processes. The pool is meant to be reused by all the searches of a game, so the
+    workers keep their transposition tables warm.
+
+    :param workers: (Integer) The number of processes (default: common.ENGINE_WORKERS)
+    :param hash_size_mb: (Integer) The memory budget of every worker's transposition table
+    (default: common.HASH_SIZE_MB)
+    :return: (multiprocessing.Pool) The pool
+    """
+    global stop_event
+    workers = common.ENGINE_WORKERS if workers is None else workers
+    hash_size_mb = common.HASH_SIZE_MB if hash_size_mb is None else hash_size_mb
+    stop_event = multiprocessing.Event()
+    return multiprocessing.Pool(workers, initializer=init_worker, initargs=(hash_size_mb, stop_event))
+
+
+class ParallelSearch(object):
+    def __init__(self, board, pool, time_limit=None, max_depth=None, table=None):
+        self.board = board
+        self.pool = pool
+        self.time_limit = common.ENGINE_TIME_LIMIT if time_limit is None else time_limit
+        self.max_depth = common.ENGINE_MAX_DEPTH if max_depth is None else max_depth
+        self.search_inst = Search(board, self.time_limit, self.max_depth, table)
+
+        self.nodes = 0
+        self.stopped = False
+
+        self.best_move = None
+        self.best_score = 0
+        self.depth = 0
+        self.elapsed = 0.0
+        self.on_depth = None  # called with the search after every finished iteration (e.g. to print UCI info lines)
+        self.tablebases = None  # endgame tables probed at the root (the workers search without them)
+        self.max_nodes = None  # the number of nodes after which the search stops, checked between root moves
+
+    def search(self):
+        """
+        This method searches the position with iterative deepening until the time budget or the maximum depth is
+        exhausted. The board is left exactly as it was found.
+
+        :return: (Move) The best move found, or None if there is no legal move
+        """
+        start = time.perf_counter()
+        deadline = time.time() + self.time_limit
+        self.nodes = 0
+        self.stopped = False
+        self.search_inst.table.new_search()
+        stop_event.clear()
+
+        moves = self.board.generate_legal_moves()
+        if not moves:
+            return None
+        self.best_move = moves[0]
+
+        if self.tablebases is not None:
+            entry = self.tablebases.best_move(self.board)
+            if entry is not None:  # the result is known: no need to search
+                (self.best_move, probe) = entry
+                (self.best_score, self.depth) = (tablebase_score(probe, 0), 0)
+                self.elapsed = time.perf_counter() - start
+                if self.on_depth is not None:
+                    self.on_depth(self)
+                return self.best_move
+
+        packed = self.board.pack()
+        search_id = (os.getpid(), next(search_ids))
+        moves_by_code = {move.encode(): move for move in moves}
+
+        for depth in range(1, self.max_depth + 1):
+            (score, move) = self.search_root(moves, depth, packed, deadline, search_id)
+            self.elapsed = time.perf_counter() - start
+            if self.stopped:
+                break
+
+            (self.best_score, self.best_move, self.depth) = (score, moves_by_code[move.encode()], depth)
+            common.debug("depth %d score %d nodes %d nps %d time %.2fs best %s" %
+                         (depth, score, self.nodes, self.nodes_per_second(), self.elapsed, move))
+
+            if self.on_depth is not None:
+                self.on_depth(self)
+
+            if abs(score) >= MATE - MAX_PLY:  # a forced mate was found
+                break
+            if self.max_nodes is not None and self.nodes >= self.max_nodes:
+                break
+
+        return self.best_move
+
+    def stop(self):
+        """
+        This method asks a running search (from another thread) to stop as soon as possible, in every process. The
+        search then returns the best move of the last finished iteration.
+
+        :return: None
+        """
+        (self.time_limit, self.stopped) = (0, True)
+        self.search_inst.stop()
+        stop_event.set()
+
+    def nodes_per_second(self):
+        """
+        This method returns the speed of the last search, all the processes included
+
+        :return: (Integer) The number of nodes searched per second
+        """
+        return int(self.nodes / self.elapsed) if self.elapsed else 0
+
+    def search_root(self, moves, depth, packed, deadline, search_id):
+        """
+        This method searches every root move to a fixed depth: the best move of the previous iteration here, to get
+        a bound, then all the other moves in the workers
+
+        :param moves: (List[Move]) The legal root moves
+        :param depth: (Integer) The depth of the search
+        :param packed: (Bytes) The packed root position
+        :param deadline: (Float) The wall clock time at which the search has to stop
+        :param search_id: (Tuple) The id of the search, so that the workers know when their tables get old
+        :return: (Integer, Move) The score and the best move
+        """
+        moves.sort(key=lambda move: move != self.best_move)
+
+        if self.max_nodes is not None:
+            self.search_inst.max_nodes = max(self.max_nodes - self.nodes, 1)
+        score = self.search_inst.search_move(moves[0], depth, -INFINITY, deadline - time.time())
+        self.nodes += self.search_inst.nodes
+        self.search_inst.nodes = 0
+        if score is None:
+            self.stopped = True
+            return 0, moves[0]
+
+        (alpha, best_move) = (score, moves[0])
+        tasks = [(packed, move.encode(), depth, alpha, deadline, search_id) for move in moves[1:]]
+
+        # every result has to be collected, even after a timeout, so that no task is left behind in the pool
+        for (index, (code, score, nodes)) in enumerate(self.pool.imap_unordered(search_root_move, tasks), 1):
+            self.nodes += nodes
+            if self.max_nodes is not None and self.nodes >= self.max_nodes and index < len(tasks):
+                self.stop()  # out of nodes: the moves still searched by the workers are dropped
+            if score is None:
+                self.stopped = True
+            elif score > alpha:
+                (alpha, best_move) = (score, Move.decode(code))
+
+        return alpha, best_move
+# endregion ParallelSearch
+
+
+# region main
+def main():
+    """
+    This method parses the command line and compares a single process search with a parallel one at a fixed depth
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Compare the single process search with the parallel search")
+    parser.add_argument("--depth", type=int, default=4, help="depth of both searches (default: 4)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes "
+                                                                             "(default: number of CPUs)")
+    parser.add_argument("--fen", default=START_FEN, help="position to search (default: start position)")
+    arguments = parser.parse_args()
+
+    common.FLAG_DEBUG = False
+    board = Board.from_fen(arguments.fen)
+
+    single = Search(board, time_limit=float("inf"), max_depth=arguments.depth)
+    start = time.perf_counter()
+    single.search()
+    single_time = time.perf_counter() - start
+    print("single:   %d process  best %s score %d nodes %d time %.2fs" %
+          (1, single.best_move, single.best_score, single.nodes, single_time))
+
+    with create_pool(arguments.workers) as pool:
+        parallel = ParallelSearch(board, pool, time_limit=float("inf"), max_depth=arguments.depth)
+        start = time.perf_counter()
+        parallel.search()
+        parallel_time = time.perf_counter() - start
+    print("parallel: %d processes best %s score %d nodes %d time %.2fs" %
+          (arguments.workers, parallel.best_move, parallel.best_score, parallel.nodes, parallel_time))
+
+    print("speedup: %.2fx" % (single_time / parallel_time))
+
+
+if __name__ == "__main__":
+    main()
+# endregion main
@@ -0,0 +1,155 @@
+"""
+The part of the project that counts the leaf nodes of the move tree (perft), to benchmark and validate move generation.
+It runs headless (without pygame):
+
+    python perft.py --depth 4
+    python perft.py --depth 3 --divide --fen "<FEN>"
+    python perft.py --suite --depth 4
+"""
+# region imports
+import argparse
+import sys
+import time
+
+import common
+from board import Board, START_FEN
+# endregion imports
+
+
+# region constants
+# standard perft test positions and their reference leaf counts for depths 1, 2, 3, ...
+TEST_POSITIONS = [
+    ("start position", START_FEN,
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603, 193690690]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333, 15833292]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487, 89941194]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594, 164075551])
+]
+# endregion constants
+
+
+# region perft
+def perft(board, depth):
+    """
+    This function counts the leaf nodes of the legal move tree, down to the requested depth
+
+    :param board: (Board) The position to start from (restored before returning)
+    :param depth: (Integer) The number of plies
+    :return: (Integer) The number of leaf nodes
+    """
+    if depth == 0:
+        return 1
+
+    moves = board.generate_legal_moves()
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move()
+    return nodes
+
+
+def divide(board, depth):
+    """
+    This function counts the leaf nodes below every legal move of the root position
+
+    :param board: (Board) The position to start from (restored before returning)
+    :param depth: (Integer) The number of plies (the root moves included)
+    :return: (Dict{Move: Integer}) The number of leaf nodes of every root move
+    """
+    nodes = {}
+    for move in board.generate_legal_moves():
+        board.make_move(move)
+        nodes[move] = perft(board, depth - 1)
+        board.unmake_move()
+    return nodes
+
+
+def run_perft(fen, depth, show_divide=False):
+    """
+    This function runs perft on a position for every depth up to the requested one and prints the throughput
+
+    :param fen: (String) The position in Forsyth-Edwards Notation
+    :param depth: (Integer) The maximum number of plies
+    :param show_divide: (Boolean) Print the node count of every root move at the maximum depth
+    :return: (List[Integer]) The leaf counts, one per depth
+    """
+    board = Board.from_fen(fen)
+    counts = []
+    for current_depth in range(1, depth + 1):
+        start = time.perf_counter()
+        if show_divide and current_depth == depth:
+            nodes_per_move = divide(board, current_depth)
+            nodes = sum(nodes_per_move.values())
+        else:
+            nodes = perft(board, current_depth)
+        elapsed = time.perf_counter() - start
+
+        counts.append(nodes)
+        print("depth %d: %12d nodes %8.2fs %10.0f nps" % (current_depth, nodes, elapsed,
+                                                           nodes / elapsed if elapsed else 0))
+
+    if show_divide:
+        for (move, nodes) in sorted(nodes_per_move.items(), key=lambda item: str(item[0])):
+            print("  %s: %d" % (move, nodes))
+    return counts
+
+
+def run_suite(depth):
+    """
+    This function runs perft on all the test positions and compares the leaf counts with the reference ones
+
+    :param depth: (Integer) The maximum number of plies
+    :return: Boolean (True if every count matches)
+    """
+    success = True
+    for (name, fen, reference_counts) in TEST_POSITIONS:
+        print("%s: %s" % (name, fen))
+        counts = run_perft(fen, min(depth, len(reference_counts)))
+        for (current_depth, (nodes, reference)) in enumerate(zip(counts, reference_counts), 1):
+            if nodes != reference:
+                print("  MISMATCH at depth %d: %d nodes, expected %d" % (current_depth, nodes, reference))
+                success = False
+
+    print("all counts match" if success else "perft suite FAILED")
+    return success
+# endregion perft
+
+
+# region main
+def main():
+    """
+    This method parses the command line and runs perft
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Count the leaf nodes of the legal move tree (perft)")
+    parser.add_argument("--depth", type=int, default=3, help="maximum number of plies (default: 3)")
+    parser.add_argument("--fen", default=START_FEN, help="position to start from (default: start position)")
+    parser.add_argument("--divide", action="store_true", help="print the node count of every root move")
+    parser.add_argument("--suite", action="store_true", help="check the standard test positions")
+    parser.add_argument("--debug", action="store_true", help="verify the incremental Zobrist keys on every move")
+    arguments = parser.parse_args()
+    if arguments.depth < 1:
+        parser.error("--depth must be at least 1")
+
+    common.FLAG_DEBUG = common.FLAG_VERIFY_KEYS = arguments.debug
+    if arguments.suite:
+        sys.exit(0 if run_suite(arguments.depth) else 1)
+
+    run_perft(arguments.fen, arguments.depth, arguments.divide)
+
+
+if __name__ == "__main__":
+    main()
+# endregion main
@@ -0,0 +1,399 @@
+"""
+The part of the project that reads and writes games in Portable Game Notation. The reader streams the games one at a
+time from a (memory-mapped) file, so databases of millions of games never have to fit in memory, and every game can be
+replayed through the rules of the board. It runs headless (without pygame):
+
+    python pgn.py games.pgn
+    python pgn.py games.pgn --workers 8 --chunk-size 500
+"""
+# region imports
+import argparse
+import mmap
+import multiprocessing
+import os
+import re
+import time
+from collections import namedtuple
+
+import common
+from bitboard import BITS, POSITIONS, PIECE_NAMES, PIECE_INDEX, NO_PIECE, PAWN, KING, square
+from board import Board, Move, START_FEN, position_name
+# endregion imports
+
+
+# region constants
+SAN_PIECES = "PNBRQK"  # indexed by piece type
+SAN_PROMOTIONS = {"N": "Knight", "B": "Bishop", "R": "Rook", "Q": "Queen"}
+SAN_PROMOTION_LETTERS = {name: letter for (letter, name) in SAN_PROMOTIONS.items()}
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+REPLAY_ERRORS = (ValueError, KeyError, IndexError)  # raised by replay() for an invalid game (moves or FEN header)
+
+# comments, variations, numeric annotations, move numbers, results and moves
+MOVETEXT_TOKENS = re.compile(r"\{[^}]*\}|;[^\n]*|\$\d+|[()]|\d+\.+|1-0|0-1|1/2-1/2|\*|[^\s(){};$.]+")
+HEADER = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# endregion constants
+
+
+# region SAN
+def parse_san(board, san):
+    """
+    This function finds the legal move of the current player that a move in Standard Algebraic Notation stands for.
+    Only the moves of the kind of piece that is named are generated.
+
+    :param board: (Board) The position
+    :param san: (String) The move, e.g. "Nbd7", "exd6", "e8=Q+", "O-O-O"
+    :return: (Move) The move
+    """
+    bitboard = board.bitboard
+    text = san.rstrip("+#!?")
+
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        king = bitboard.king_square(bitboard.color)
+        if king is None:
+            raise ValueError("Castling %s without a King in %s" % (san, board.to_fen()))
+        next_sq = king + 2 if len(text) == 3 else king - 2
+        for (last_sq, target, _) in bitboard.legal_moves(BITS[king]):
+            if target == next_sq:
+                return Move(POSITIONS[last_sq], POSITIONS[next_sq])
+        raise ValueError("Illegal castling %s in %s" % (san, board.to_fen()))
+
+    promotion = None
+    if len(text) > 2 and text[-1] in SAN_PROMOTIONS:
+        promotion = PIECE_INDEX[SAN_PROMOTIONS[text[-1]]]
+        text = text[:-2] if text[-2] == "=" else text[:-1]
+
+    piece_type = SAN_PIECES.find(text[0]) if text[:1].isupper() else PAWN
+    if piece_type < 0 or len(text) < 2 or text[-2] not in "abcdefgh" or text[-1] not in "12345678":
+        raise ValueError("Invalid move %s" % san)
+    next_sq = square(common.DIMENSION - int(text[-1]), ord(text[-2]) - 97)
+    hints = text[1 if piece_type != PAWN else 0:-2].replace("x", "")
+
+    matches = []
+    for (last_sq, target, move_promotion) in bitboard.legal_moves(bitboard.pieces[bitboard.color * 6 + piece_type]):
+        if target == next_sq and move_promotion == promotion and \
+                all(hint in position_name(POSITIONS[last_sq]) for hint in hints):
+            matches.append(last_sq)
+
+    if len(matches) != 1:
+        raise ValueError("%s move %s in %s" % ("Ambiguous" if matches else "Illegal", san, board.to_fen()))
+    return Move(POSITIONS[matches[0]], POSITIONS[next_sq], None if promotion is None else PIECE_NAMES[promotion])
+
+
+def to_san(board, move, legal_moves=None):
+    """
+    This function writes a legal move of the current player in Standard Algebraic Notation
+
+    :param board: (Board) The position (restored before returning)
+    :param move: (Move) The move
+    :param legal_moves: (List[Move]) The legal moves of the position, if they are already known
+    :return: (String) The move, e.g. "Nbd7", "exd6", "e8=Q+", "O-O-O"
+    """
+    legal_moves = board.generate_legal_moves() if legal_moves is None else legal_moves
+    squares = board.bitboard.squares
+    last_sq = square(*move.last_position)
+    piece_type = squares[last_sq] % 6
+    is_capture = squares[square(*move.next_position)] != NO_PIECE or \
+        (piece_type == PAWN and move.last_position[1] != move.next_position[1])
+
+    if piece_type == KING and abs(move.next_position[1] - move.last_position[1]) == 2:
+        san = "O-O" if move.next_position[1] == 6 else "O-O-O"
+    elif piece_type == PAWN:
+        san = (position_name(move.last_position)[0] + "x" if is_capture else "") + position_name(move.next_position)
+        if move.promotion is not None:
+            san += "=" + SAN_PROMOTION_LETTERS[move.promotion]
+    else:
+        rivals = [other.last_position for other in legal_moves
+                  if other.next_position == move.next_position and other.last_position != move.last_position and
+                  squares[square(*other.last_position)] % 6 == piece_type]
+        name = position_name(move.last_position)
+        if not rivals:
+            hint = ""
+        elif all(rival[1] != move.last_position[1] for rival in rivals):
+            hint = name[0]
+        elif all(rival[0] != move.last_position[0] for rival in rivals):
+            hint = name[1]
+        else:
+            hint = name
+        san = SAN_PIECES[piece_type] + hint + ("x" if is_capture else "") + position_name(move.next_position)
+
+    board.make_move(move)
+    if board.in_check():
+        san += "#" if not board.generate_legal_moves() else "+"
+    board.unmake_move()
+    return san
+
+
+def format_game(headers, sans, result, first_color="white", fullmove_number=1):
+    """
+    This function writes a game in Portable Game Notation
+
+    :param headers: (Dict{String: String}) The tag pairs, in the order they are written
+    :param sans: (List[String]) The moves in Standard Algebraic Notation
+    :param result: (String) The result: "1-0", "0-1", "1/2-1/2" or "*"
+    :param first_color: (String) The color of the player who made the first move
+    :param fullmove_number: (Integer) The number of the first move
+    :return: (String) The game, followed by an empty line
+    """
+    lines = ['[%s "%s"]' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+             for (name, value) in headers.items()]
+    lines.append("")
+
+    tokens = []
+    for (ply, san) in enumerate(sans):
+        if first_color == "black":
+            ply += 1
+        if ply % 2 == 0:
+            tokens.append("%d." % (fullmove_number + ply // 2))
+        elif not tokens:
+            tokens.append("%d..." % fullmove_number)
+        tokens.append(san)
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:  # the lines of the movetext are kept under 80 characters
+        if line and len(line) + len(token) >= 80:
+            lines.append(line)
+            line = ""
+        line = token if not line else line + " " + token
+    lines.append(line)
+
+    return "\n".join(lines) + "\n\n"
+# endregion SAN
+
+
+# region reader
+Game = namedtuple("Game", ["offset", "headers", "movetext"])
+
+
+def iter_lines(data, start=0, end=None):
+    """
+    This function splits a buffer (bytes or a memory-mapped file) into lines, without copying the whole buffer
+
+    :param data: (Bytes / mmap.mmap) The buffer
+    :param start: (Integer) The offset of the first line
+    :param end: (Integer) The offset where the reading stops (default: the end of the buffer)
+    :return: (Generator[(Integer, Bytes)]) The offset and the content of every line
+    """
+    end = len(data) if end is None else end
+    while start < end:
+        stop = data.find(b"\n", start, end)
+        stop = end if stop < 0 else stop
+        yield start, data[start:stop]
+        start = stop + 1
+
+
+def iter_games(lines):
+    """
+    This function groups lines into games: a block of header lines followed by the movetext
+
+    :param lines: (Iterable[(Integer, Bytes)]) The offset and the content of every line
+    :return: (Generator[Game]) The games
+    """
+    (offset, headers, movetext) = (None, {}, [])
+    for (line_offset, line) in lines:
+        line = line.strip()
+        if line.startswith(b"["):
+            if movetext:  # a new game starts
+                yield Game(offset, headers, " ".join(movetext))
+                (offset, headers, movetext) = (None, {}, [])
+            match = HEADER.match(line.decode("utf-8", "replace"))
+            if match:
+                headers[match.group(1)] = match.group(2)
+        elif line and not line.startswith(b"%"):
+            movetext.append(line.decode("utf-8", "replace"))
+        else:
+            continue
+
+        if offset is None:
+            offset = line_offset
+
+    if headers or movetext:
+        yield Game(offset, headers, " ".join(movetext))
+
+
+def read_games(path, use_mmap=True, start=0, end=None):
+    """
+    This function streams the games of a PGN file, one at a time
+
+    :param path: (String) The path of the file
+    :param use_mmap: Boolean (True to memory-map the file, False to read it line by line)
+    :param start: (Integer) The offset of the first game to read (memory-mapped files only)
+    :param end: (Integer) The offset where the reading stops (memory-mapped files only)
+    :return: (Generator[Game]) The games
+    """
+    with open(path, "rb") as file:
+        if not use_mmap:
+            yield from iter_games(file_lines(file))
+            return
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from iter_games(iter_lines(data, start, end))
+
+
+def file_lines(file):
+    """
+    This function reads the lines of a file object and their offsets
+
+    :param file: (File) The file, opened in binary mode
+    :return: (Generator[(Integer, Bytes)]) The offset and the content of every line
+    """
+    offset = 0
+    for line in file:
+        yield offset, line.rstrip(b"\r\n")
+        offset += len(line)
+
+
+def movetext_sans(movetext):
+    """
+    This function extracts the moves of the main line from a movetext (comments, variations, annotations, move
+    numbers and the result are skipped)
+
+    :param movetext: (String) The movetext of a game
+    :return: (Generator[String]) The moves in Standard Algebraic Notation
+    """
+    variation_depth = 0
+    for token in MOVETEXT_TOKENS.findall(movetext):
+        first = token[0]
+        if first == "(":
+            variation_depth += 1
+        elif first == ")":
+            variation_depth -= 1
+        elif variation_depth or first in "{;$" or first.isdigit() and token[-1] == "." or token in RESULTS:
+            continue
+        else:
+            yield token
+
+
+def replay(game):
+    """
+    This function replays a game through the rules of the board. Before every move, it yields the board in the
+    position where the move is played (the same board object, which is modified as the game goes on).
+
+    :param game: (Game) The game
+    :return: (Generator[(Board, Move, String)]) The board, the move and its Standard Algebraic Notation
+    """
+    board = Board.from_fen(game.headers.get("FEN", START_FEN))
+    for san in movetext_sans(game.movetext):
+        move = parse_san(board, san)
+        yield board, move, san
+        board.make_move(move)
+
+        if san.endswith("#") and (not board.in_check() or board.generate_legal_moves()):
+            raise ValueError("%s is marked as checkmate in %s" % (san, board.to_fen()))
+        if san.endswith("+") and not board.in_check():
+            raise ValueError("%s is marked as check in %s" % (san, board.to_fen()))
+# endregion reader
+
+
+# region validate
+def validate_games(games):
+    """
+    This function replays games and collects the ones that break the rules of the board
+
+    :param games: (Iterable[Game]) The games
+    :return: (Integer, Integer, List[(Integer, String)]) The number of games, the number of moves, and the offset and
+    the error of every invalid game
+    """
+    (count, plies, errors) = (0, 0, [])
+    for game in games:
+        count += 1
+        try:
+            for _ in replay(game):
+                plies += 1
+        except REPLAY_ERRORS as exception:
+            errors.append((game.offset, str(exception)))
+
+    return count, plies, errors
+
+
+def validate_chunk(chunk):
+    """
+    This function validates the games of a part of a PGN file, in a worker process
+
+    :param chunk: (String, Integer, Integer) The path of the file, the offset of the first game and the offset where
+    the part ends
+    :return: (Integer, Integer, List[(Integer, String)]) The result of validate_games
+    """
+    (path, start, end) = chunk
+    return validate_games(read_games(path, True, start, end))
+
+
+def split_chunks(path, chunk_size):
+    """
+    This function scans a PGN file for the offsets of its games and groups them into chunks
+
+    :param path: (String) The path of the file
+    :param chunk_size: (Integer) The number of games per chunk
+    :return: (Generator[(String, Integer, Integer)]) The chunks for validate_chunk
+    """
+    (start, count) = (None, 0)
+    for game in read_games(path):
+        if count == chunk_size:
+            yield path, start, game.offset
+            (start, count) = (None, 0)
+        if start is None:
+            start = game.offset
+        count += 1
+
+    if count:
+        yield path, start, os.path.getsize(path)
+
+
+def validate_file(path, workers=1, chunk_size=200, use_mmap=True):
+    """
+    This function validates all the games of a PGN file, in parallel if several workers are requested
+
+    :param path: (String) The path of the file
+    :param workers: (Integer) The number of processes
+    :param chunk_size: (Integer) The number of games sent to a worker at once
+    :param use_mmap: Boolean (True to memory-map the file)
+    :return: (Integer, Integer, List[(Integer, String)]) The number of games, the number of moves, and the offset and
+    the error of every invalid game
+    """
+    if workers <= 1:
+        return validate_games(read_games(path, use_mmap))
+
+    (count, plies, errors) = (0, 0, [])
+    with multiprocessing.Pool(workers) as pool:
+        for (chunk_count, chunk_plies, chunk_errors) in pool.imap_unordered(validate_chunk,
+                                                                            split_chunks(path, chunk_size)):
+            count += chunk_count
+            plies += chunk_plies
+            errors.extend(chunk_errors)
+
+    return count, plies, sorted(errors)
+# endregion validate
+
+
+# region main
+def main():
+    """
+    This method parses the command line and validates a PGN file
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Replay the games of a PGN file through the rules of the board")
+    parser.add_argument("path", help="PGN file")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes (default: 1)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="games sent to a worker at once (default: 200)")
+    parser.add_argument("--no-mmap", action="store_true", help="read the file line by line instead of mapping it")
+    arguments = parser.parse_args()
+
+    common.FLAG_DEBUG = False
+    start = time.perf_counter()
+    (count, plies, errors) = validate_file(arguments.path, arguments.workers, arguments.chunk_size,
+                                           not arguments.no_mmap)
+    elapsed = time.perf_counter() - start
+
+    for (offset, message) in errors:
+        print("game at byte %d: %s" % (offset, message))
+    print("%d games, %d moves, %d invalid in %.2fs (%.0f games/s, %.0f moves/s)" %
+          (count, plies, len(errors), elapsed, count / elapsed if elapsed else 0, plies / elapsed if elapsed else 0))
+
+
+if __name__ == "__main__":
+    main()
+# endregion main
@@ -0,0 +1,331 @@
+"""
+The part of the project that deals with the computer opponent: an iterative deepening alpha-beta search
+"""
+# region imports
+import time
+
+import common
+from bitboard import QUEEN, NO_PIECE, BITS, square
+from evaluation import PIECE_VALUES
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+# endregion imports
+
+
+# region constants
+INFINITY = 1000000
+MATE = 100000
+MAX_PLY = 128
+
+TIME_CHECK_INTERVAL = 1024  # nodes between two looks at the clock
+# endregion constants
+
+
+# region Search
+def score_to_table(score, ply):
+    """
+    This function converts a mate score from "distance to the root" to "distance to the current node", so that it
+    stays valid when the position is reached through another path
+
+    :param score: (Integer) The score relative to the root
+    :param ply: (Integer) The distance from the root
+    :return: (Integer) The score to store
+    """
+    if score >= MATE - MAX_PLY:
+        return score + ply
+    if score <= -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """
+    This function converts a stored mate score back to "distance to the root"
+
+    :param score: (Integer) The stored score
+    :param ply: (Integer) The distance from the root
+    :return: (Integer) The score relative to the root
+    """
+    if score >= MATE - MAX_PLY:
+        return score - ply
+    if score <= -MATE + MAX_PLY:
+        return score + ply
+    return score
+
+
+def tablebase_score(probe, ply):
+    """
+    This function converts the result of an endgame table to a search score
+
+    :param probe: (Probe) The result of the position for the player to move
+    :param ply: (Integer) The distance from the root
+    :return: (Integer) The score of the position for the player to move
+    """
+    if probe.result > 0:
+        return MATE - ply - probe.plies
+    if probe.result < 0:
+        return -MATE + ply + probe.plies
+    return 0
+
+
+class Search(object):
+    def __init__(self, board, time_limit=None, max_depth=None, table=None):
+        self.board = board
+        self.time_limit = common.ENGINE_TIME_LIMIT if time_limit is None else time_limit
+        self.max_depth = common.ENGINE_MAX_DEPTH if max_depth is None else max_depth
+        self.table = TranspositionTable() if table is None else table
+
+        self.nodes = 0
+        self.deadline = None
+        self.stopped = False
+
+        self.best_move = None
+        self.best_score = 0
+        self.depth = 0
+        self.elapsed = 0.0
+        self.on_depth = None  # called with the search after every finished iteration (e.g. to print UCI info lines)
+        self.tablebases = None  # endgame tables probed at every node (see tablebase.Tablebases)
+        self.max_nodes = None  # the number of nodes after which the search stops, if any (e.g. UCI "go nodes")
+
+    def search(self):
+        """
+        This method searches the position with iterative deepening until the time budget or the maximum depth is
+        exhausted. The board is left exactly as it was found.
+
+        :return: (Move) The best move found, or None if there is no legal move
+        """
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit
+        self.nodes = 0
+        self.stopped = False
+        self.table.new_search()
+
+        moves = self.board.generate_legal_moves()
+        if not moves:
+            return None
+        self.best_move = moves[0]
+
+        if self.tablebases is not None:
+            entry = self.tablebases.best_move(self.board)
+            if entry is not None:  # the result is known: no need to search
+                (self.best_move, probe) = entry
+                (self.best_score, self.depth) = (tablebase_score(probe, 0), 0)
+                self.elapsed = time.perf_counter() - start
+                if self.on_depth is not None:
+                    self.on_depth(self)
+                return self.best_move
+
+        for depth in range(1, self.max_depth + 1):
+            (score, move) = self.search_root(moves, depth)
+            self.elapsed = time.perf_counter() - start
+            if self.stopped:
+                break
+
+            (self.best_score, self.best_move, self.depth) = (score, move, depth)
+            common.debug("depth %d score %d nodes %d nps %d time %.2fs hash hits %d misses %d collisions %d best %s" %
+                         (depth, score, self.nodes, self.nodes_per_second(), self.elapsed, self.table.hits,
+                          self.table.misses, self.table.collisions, move))
+
+            if self.on_depth is not None:
+                self.on_depth(self)
+
+            if abs(score) >= MATE - MAX_PLY:  # a forced mate was found
+                break
+
+        return self.best_move
+
+    def nodes_per_second(self):
+        """
+        This method returns the speed of the last search
+
+        :return: (Integer) The number of nodes searched per second
+        """
+        return int(self.nodes / self.elapsed) if self.elapsed else 0
+
+    def search_root(self, moves, depth):
+        """
+        This method searches every root move to a fixed depth, starting with the best move of the previous iteration
+
+        :param moves: (List[Move]) The legal root moves
+        :param depth: (Integer) The depth of the search
+        :return: (Integer, Move) The score and the best move
+        """
+        moves.sort(key=lambda move: move != self.best_move)
+
+        (alpha, best_move) = (-INFINITY, moves[0])
+        for move in moves:
+            self.board.make_move(move)
+            score = -self.alpha_beta(depth - 1, -INFINITY, -alpha, 1)
+            self.board.unmake_move()
+
+            if self.stopped:
+                break
+            if score > alpha:
+                (alpha, best_move) = (score, move)
+
+        return alpha, best_move
+
+    def stop(self):
+        """
+        This method asks a running search (from another thread) to stop as soon as possible. The search then returns
+        the best move of the last finished iteration.
+
+        :return: None
+        """
+        (self.time_limit, self.deadline, self.stopped) = (0, 0, True)
+
+    def search_move(self, move, depth, alpha, time_limit):
+        """
+        This method searches a single root move to a fixed depth, for the workers of a parallel search. Only a score
+        above alpha is exact; a lower one just tells that the move is not better than the best one known.
+
+        :param move: (Move) The root move
+        :param depth: (Integer) The depth of the search (the root move included)
+        :param alpha: (Integer) The score of the best root move known so far
+        :param time_limit: (Float) The seconds left before the search has to stop
+        :return: (Integer) The score of the move, or None if the time ran out
+        """
+        self.deadline = time.perf_counter() + time_limit
+        self.stopped = False
+
+        self.board.make_move(move)
+        score = -self.alpha_beta(depth - 1, -INFINITY, -alpha, 1)
+        self.board.unmake_move()
+
+        return None if self.stopped else score
+
+    def alpha_beta(self, depth, alpha, beta, ply):
+        """
+        This method searches a position with the negamax form of alpha-beta
+
+        :param depth: (Integer) The remaining depth
+        :param alpha: (Integer) The score the player to move is already guaranteed
+        :param beta: (Integer) The score the opponent is already guaranteed
+        :param ply: (Integer) The distance from the root
+        :return: (Integer) The score of the position for the player to move
+        """
+        if depth <= 0:
+            return self.quiescence(alpha, beta, ply)
+
+        if self.is_out_of_time():
+            return 0
+
+        if self.tablebases is not None:
+            probe = self.tablebases.probe(self.board)
+            if probe is not None:
+                return tablebase_score(probe, ply)
+
+        key = self.board.get_zobrist_key()
+        entry = self.table.probe(key)
+        table_move = None
+        if entry is not None:
+            (entry_depth, entry_score, bound, table_move) = entry
+            entry_score = score_from_table(entry_score, ply)
+            if entry_depth >= depth and (bound == EXACT or
+                                         (bound == LOWER_BOUND and entry_score >= beta) or
+                                         (bound == UPPER_BOUND and entry_score <= alpha)):
+                return entry_score
+
+        moves = self.board.generate_legal_moves()
+        if not moves:
+            return -MATE + ply if self.board.in_check() else 0
+
+        original_alpha = alpha
+        (best_score, best_move) = (-INFINITY, None)
+        for move in self.order_moves(moves, table_move):
+            self.board.make_move(move)
+            score = -self.alpha_beta(depth - 1, -beta, -alpha, ply + 1)
+            self.board.unmake_move()
+
+            if self.stopped:
+                return 0
+            if score > best_score:
+                (best_score, best_move) = (score, move)
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best_score >= beta:
+            bound = LOWER_BOUND
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+        self.table.store(key, depth, score_to_table(best_score, ply), bound, best_move)
+
+        return best_score
+
+    def quiescence(self, alpha, beta, ply):
+        """
+        This method only searches captures (and promotions) until the position is quiet, so that the static
+        evaluation is not taken in the middle of an exchange
+
+        :param alpha: (Integer) The score the player to move is already guaranteed
+        :param beta: (Integer) The score the opponent is already guaranteed
+        :param ply: (Integer) The distance from the root
+        :return: (Integer) The score of the position for the player to move
+        """
+        if self.is_out_of_time():
+            return 0
+
+        stand_pat = self.board.evaluate()
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        enemy = self.board.bitboard.occupancy[self.board.bitboard.color ^ 1]
+        captures = [move for move in self.board.generate_legal_moves()
+                    if move.promotion or enemy & BITS[square(*move.next_position)]]
+        for move in self.order_moves(captures):
+            self.board.make_move(move)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            self.board.unmake_move()
+
+            if self.stopped:
+                return 0
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+    def order_moves(self, moves, first_move=None):
+        """
+        This method sorts the moves so that the most promising ones are searched first: the best move stored in the
+        transposition table, captures of valuable pieces by cheap pieces (MVV-LVA), then promotions, then quiet moves
+
+        :param moves: (List[Move]) The moves
+        :param first_move: (Move) The move to search before all the others, if any
+        :return: (List[Move]) The sorted moves
+        """
+        squares = self.board.bitboard.squares
+
+        def score(move):
+            value = 0
+            captured = squares[square(*move.next_position)]
+            if captured != NO_PIECE:
+                value = 10 * PIECE_VALUES[captured % 6] - PIECE_VALUES[squares[square(*move.last_position)] % 6]
+            if move.promotion == "Queen":
+                value += PIECE_VALUES[QUEEN]
+            if move == first_move:
+                value = INFINITY
+            return -value
+
+        return sorted(moves, key=score)
+
+    def is_out_of_time(self):
+        """
+        This method counts the current node, stops at the node budget and looks at the clock every
+        TIME_CHECK_INTERVAL nodes
+
+        :return: Boolean (True if the search has to stop)
+        """
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.stopped = True
+        elif self.nodes % TIME_CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            self.stopped = True
+        return self.stopped
+# endregion Search
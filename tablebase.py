@@ -0,0 +1,703 @@
+"""
+The part of the project that deals with endgame tablebases: the exact result and distance to mate of every position of
+a small material set (Kings and at most two other pieces, no Pawns), so that the engine and the UI never have to search
+those endings. The tables are generated offline by retrograde analysis, starting from the mates and walking the moves
+backwards, and stored one file per material set with one byte per position:
+
+    python tablebase.py KQvK KRvK
+    python tablebase.py KQvKR --workers 4
+    python tablebase.py KBNvK --path tablebases
+
+The eight symmetries of the board (the Pawns would break them) bring every position to one whose white King stands in
+the a1-d1-d4 triangle, which leaves 462 placements of the two Kings. The files are memory-mapped when probed, so
+opening them costs nothing.
+"""
+# region imports
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+from array import array
+from collections import namedtuple
+
+import common
+from bitboard import WHITE, BLACK, KNIGHT, BISHOP, ROOK, QUEEN, KING, BITS, POSITIONS, KING_ATTACKS, square, \
+    iter_bits, piece_attacks
+# endregion imports
+
+
+# region constants
+MAGIC = b"CHSDTM01"
+HEADER = struct.Struct("<8s16sQ")  # magic, material, positions per side to move
+
+MAX_PIECES = 4  # Kings included
+PIECE_LETTERS = {"N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN}
+LETTERS = {piece_type: letter for (letter, piece_type) in PIECE_LETTERS.items()}
+
+# one byte per position: 0 for a draw, 1 to 127 for a win in 2 * value - 1 plies, 128 to 254 for a loss in
+# 2 * (value - 128) plies (128 is a mate), 255 for an index that is not a legal position
+DRAW = 0
+LOSS = 128
+INVALID = 255
+NONE = 255  # no capture wins (see init_slice)
+
+DEFAULT_CHUNK_SIZE = 16384  # positions handed to a worker at once
+
+Probe = namedtuple("Probe", ["result", "plies"])  # 1 (win), 0 (draw) or -1 (loss) for the player to move
+# endregion constants
+
+
+# region symmetries
+def _transforms():
+    """
+    This function builds the eight symmetries of the board: the identity, the mirrors and the rotations
+
+    :return: (Tuple[Tuple[Integer]]) The image of every square, indexed by [symmetry][square]
+    """
+    last = common.DIMENSION - 1
+    functions = [lambda row, col: (row, col), lambda row, col: (row, last - col),
+                 lambda row, col: (last - row, col), lambda row, col: (last - row, last - col),
+                 lambda row, col: (col, row), lambda row, col: (col, last - row),
+                 lambda row, col: (last - col, row), lambda row, col: (last - col, last - row)]
+    return tuple(tuple(square(*function(row, col)) for (row, col) in POSITIONS) for function in functions)
+
+
+def _king_pairs():
+    """
+    This function lists the placements of the two Kings that stay once the symmetries are taken into account: the
+    smallest image of every legal placement (the Kings on different, non adjacent squares)
+
+    :return: (List[(Integer, Integer)], List[(Integer, Tuple[Integer])]) The canonical placements, and for every
+    placement (indexed by white King * 64 + black King) the index of its canonical placement and the symmetries that
+    lead to it (None for an illegal placement)
+    """
+    images = {}
+    for white_king in range(64):
+        for black_king in range(64):
+            if white_king != black_king and not KING_ATTACKS[white_king] & BITS[black_king]:
+                images[white_king, black_king] = [(TRANSFORMS[t][white_king], TRANSFORMS[t][black_king])
+                                                  for t in range(len(TRANSFORMS))]
+
+    pairs = sorted(set(min(placements) for placements in images.values()))
+    pair_index = {pair: index for (index, pair) in enumerate(pairs)}
+
+    table = [None] * 64 * 64
+    for ((white_king, black_king), placements) in images.items():
+        canonical = min(placements)
+        table[white_king * 64 + black_king] = (pair_index[canonical], tuple(t for (t, placement) in
+                                                                           enumerate(placements)
+                                                                           if placement == canonical))
+    return pairs, table
+
+
+TRANSFORMS = _transforms()
+(KING_PAIRS, KING_INDEX) = _king_pairs()
+# endregion symmetries
+
+
+# region Material
+def parse_side(letters):
+    """
+    This function reads the pieces of one side of a material set name
+
+    :param letters: (String) The pieces, the King first, e.g. "KQ"
+    :return: (Tuple[Integer]) The piece types other than the King, the most valuable first
+    """
+    if not letters.startswith("K") or any(letter not in PIECE_LETTERS for letter in letters[1:]):
+        raise ValueError("Unsupported pieces (Kings, Queens, Rooks, Bishops and Knights only): %s" % letters)
+    return tuple(sorted((PIECE_LETTERS[letter] for letter in letters[1:]), reverse=True))
+
+
+def material_name(white, black):
+    """
+    This function names a material set, e.g. "KQvKR"
+
+    :param white: (Tuple[Integer]) The piece types of White other than the King
+    :param black: (Tuple[Integer]) The piece types of Black other than the King
+    :return: (String) The name
+    """
+    return "K" + "".join(LETTERS[t] for t in white) + "vK" + "".join(LETTERS[t] for t in black)
+
+
+def canonical_material(white, black):
+    """
+    This function orders the sides of a material set: only the sets where White is at least as strong as Black are
+    generated, the others are probed with the colors swapped
+
+    :param white: (Tuple[Integer]) The piece types of White other than the King, the most valuable first
+    :param black: (Tuple[Integer]) The piece types of Black other than the King, the most valuable first
+    :return: (Tuple[Integer], Tuple[Integer], Boolean) The stronger side, the weaker side and whether or not the
+    colors were swapped
+    """
+    if (len(black), black) > (len(white), white):
+        return black, white, True
+    return white, black, False
+
+
+class Material(object):
+    def __init__(self, name):
+        sides = name.split("v")
+        if len(sides) != 2:
+            raise ValueError("Invalid material set: %s" % name)
+        (self.white, self.black) = (parse_side(sides[0]), parse_side(sides[1]))
+        if (self.white, self.black, False) != canonical_material(self.white, self.black):
+            raise ValueError("The stronger side has to be White: %s" % name)
+
+        self.name = material_name(self.white, self.black)
+        self.count = 2 + len(self.white) + len(self.black)
+        if self.count > MAX_PIECES:
+            raise ValueError("At most %d pieces are supported: %s" % (MAX_PIECES, name))
+
+        # piece codes in the order of the squares of a position: the Kings, then the other pieces of White and Black
+        self.codes = (WHITE * 6 + KING, BLACK * 6 + KING) + tuple(WHITE * 6 + t for t in self.white) + \
+            tuple(BLACK * 6 + t for t in self.black)
+        self.colors = tuple(code // 6 for code in self.codes)
+        # ranges of identical pieces, whose squares are sorted so that every position has a single index
+        self.groups = [(start, start + 2) for start in range(2, self.count - 1)
+                       if self.codes[start] == self.codes[start + 1]]
+
+        self.placements = 64 ** (self.count - 2)
+        self.size = len(KING_PAIRS) * self.placements
+
+    def index(self, squares):
+        """
+        This method computes the index of a position, the same for all its symmetric images
+
+        :param squares: (List[Integer]) The square of every piece, in the order of self.codes
+        :return: (Integer) The index, or None if the Kings stand too close
+        """
+        entry = KING_INDEX[squares[0] * 64 + squares[1]]
+        if entry is None:
+            return None
+
+        (pair, transforms) = entry
+        best = None
+        for t in transforms:
+            image = [TRANSFORMS[t][sq] for sq in squares[2:]]
+            for (start, end) in self.groups:
+                image[start - 2:end - 2] = sorted(image[start - 2:end - 2])
+
+            value = 0
+            for sq in image:
+                value = value * 64 + sq
+            if best is None or value < best:
+                best = value
+        return pair * self.placements + best
+
+    def squares(self, index):
+        """
+        This method decodes an index
+
+        :param index: (Integer) The index
+        :return: (List[Integer]) The square of every piece, in the order of self.codes
+        """
+        (pair, placement) = divmod(index, self.placements)
+        pieces = []
+        for _ in range(self.count - 2):
+            (placement, sq) = divmod(placement, 64)
+            pieces.append(sq)
+        return list(KING_PAIRS[pair]) + pieces[::-1]
+
+    def captures(self):
+        """
+        This method lists the material sets left after a capture
+
+        :return: (List[String]) The names of the canonical material sets
+        """
+        names = set()
+        for (pieces, others, white_captures) in [(self.black, self.white, True), (self.white, self.black, False)]:
+            for index in range(len(pieces)):
+                remaining = pieces[:index] + pieces[index + 1:]
+                (white, black) = (others, remaining) if white_captures else (remaining, others)
+                names.add(material_name(*canonical_material(white, black)[:2]))
+        return sorted(names)
+# endregion Material
+
+
+# region positions
+def is_attacked(material, squares, sq, color, occupancy):
+    """
+    This function determines whether or not a square is attacked by the pieces of a color
+
+    :param material: (Material) The material set
+    :param squares: (List[Integer]) The square of every piece (None for a piece that was just captured)
+    :param sq: (Integer) The square
+    :param color: (Integer) The color of the attackers
+    :param occupancy: (Integer) The bitboard of all the occupied squares
+    :return: Boolean (True or False)
+    """
+    for (index, piece_sq) in enumerate(squares):
+        if material.colors[index] == color and piece_sq is not None and \
+                piece_attacks(material.codes[index], piece_sq, occupancy) & BITS[sq]:
+            return True
+    return False
+
+
+def occupancy_of(squares):
+    """
+    This function computes the bitboard of the occupied squares
+
+    :param squares: (List[Integer]) The square of every piece
+    :return: (Integer) The bitboard
+    """
+    occupancy = 0
+    for sq in squares:
+        occupancy |= BITS[sq]
+    return occupancy
+
+
+def is_legal(material, squares, color):
+    """
+    This function determines whether or not a decoded index is a legal position: distinct squares, the index that the
+    position maps to, and the player who is not to move not in check
+
+    :param material: (Material) The material set
+    :param squares: (List[Integer]) The square of every piece
+    :param color: (Integer) The color of the player to move
+    :return: Boolean (True or False)
+    """
+    occupancy = occupancy_of(squares)
+    if bin(occupancy).count("1") != len(squares):
+        return False
+    return not is_attacked(material, squares, squares[color ^ 1], color, occupancy)
+
+
+def captured_position(material, squares, captured, color):
+    """
+    This function describes the position left after a capture in the terms of the table that holds it
+
+    :param material: (Material) The material set before the capture
+    :param squares: (List[Integer]) The square of every piece, after the capture was made
+    :param captured: (Integer) The index of the captured piece
+    :param color: (Integer) The color of the player to move after the capture
+    :return: (String, List[Integer], Integer) The name of the canonical material set, the squares in its order and the
+    color to move in it
+    """
+    codes = material.codes[:captured] + material.codes[captured + 1:]
+    squares = squares[:captured] + squares[captured + 1:]
+    white = tuple(code % 6 for code in codes[2:] if code // 6 == WHITE)
+    black = tuple(code % 6 for code in codes[2:] if code // 6 == BLACK)
+
+    (strong, weak, swapped) = canonical_material(white, black)
+    if swapped:
+        squares = [squares[1], squares[0]] + squares[2 + len(white):] + squares[2:2 + len(white)]
+        color ^= 1
+    return material_name(strong, weak), squares, color
+
+
+def decode(value):
+    """
+    This function decodes the byte of a position
+
+    :param value: (Integer) The byte
+    :return: (Probe) The result for the player to move and the number of plies to mate (None for an illegal index)
+    """
+    if value == INVALID:
+        return None
+    if value == DRAW:
+        return Probe(0, 0)
+    if value < LOSS:
+        return Probe(1, 2 * value - 1)
+    return Probe(-1, 2 * (value - LOSS))
+
+
+def encode(plies):
+    """
+    This function encodes a win (odd number of plies) or a loss (even number of plies)
+
+    :param plies: (Integer) The number of plies to mate
+    :return: (Integer) The byte
+    """
+    return (plies + 1) // 2 if plies % 2 else LOSS + plies // 2
+# endregion positions
+
+
+# region Tablebases
+class Tablebase(object):
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, name, size) = HEADER.unpack_from(self.data, 0)
+        self.material = Material(name.rstrip(b"\0").decode("ascii")) if magic == MAGIC else None
+        if self.material is None or size != self.material.size or HEADER.size + 2 * size != len(self.data):
+            raise ValueError("%s is not an endgame tablebase" % path)
+
+    def value(self, color, index):
+        """
+        This method reads the byte of a position
+
+        :param color: (Integer) The color of the player to move
+        :param index: (Integer) The index of the position (see Material.index)
+        :return: (Integer) The byte
+        """
+        return self.data[HEADER.size + color * self.material.size + index]
+
+    def close(self):
+        """
+        This method releases the memory map and the file
+
+        :return: None
+        """
+        self.data.close()
+        self.file.close()
+
+
+class Tablebases(object):
+    def __init__(self, path=None):
+        self.path = common.TABLEBASE_PATH if path is None else path
+        self.tables = {}  # material set name -> Tablebase (None if there is no file), opened on first use
+
+        names = os.listdir(self.path) if os.path.isdir(self.path) else []
+        counts = [len(name.split(".")[0]) for name in names if name.endswith(".dtm")]  # "KQvKR" -> 5 letters
+        self.max_pieces = max(counts, default=1) - 1
+
+    def table(self, name):
+        """
+        This method returns the table of a material set
+
+        :param name: (String) The name of the canonical material set
+        :return: (Tablebase) The table, or None if it has not been generated
+        """
+        if name not in self.tables:
+            path = os.path.join(self.path, name + ".dtm")
+            self.tables[name] = Tablebase(path) if os.path.exists(path) else None
+        return self.tables[name]
+
+    def probe_squares(self, name, squares, color):
+        """
+        This method probes a position given in the terms of a table
+
+        :param name: (String) The name of the canonical material set
+        :param squares: (List[Integer]) The square of every piece
+        :param color: (Integer) The color of the player to move
+        :return: (Probe) The result, or None if the table is missing or the position illegal
+        """
+        table = self.table(name)
+        if table is None:
+            return None
+        index = table.material.index(squares)
+        return None if index is None else decode(table.value(color, index))
+
+    def probe(self, board):
+        """
+        This method looks a position up. It returns at once when the board holds too many pieces.
+
+        :param board: (Board) The position
+        :return: (Probe) The result for the player to move, or None if the position is not covered
+        """
+        bitboard = board.bitboard
+        occupancy = bitboard.occupancy[WHITE] | bitboard.occupancy[BLACK]
+        if bin(occupancy).count("1") > self.max_pieces or bitboard.castling:
+            return None
+
+        (white, black) = ([], [])
+        for (pieces, color) in [(white, WHITE), (black, BLACK)]:
+            for piece_type in (QUEEN, ROOK, BISHOP, KNIGHT):
+                for sq in iter_bits(bitboard.pieces[color * 6 + piece_type]):
+                    pieces.append((piece_type, sq))
+            if bitboard.pieces[color * 6]:  # Pawns
+                return None
+
+        (strong, weak, swapped) = canonical_material(tuple(t for (t, _) in white), tuple(t for (t, _) in black))
+        kings = [bitboard.king_square(WHITE), bitboard.king_square(BLACK)]
+        if swapped:
+            (kings, white, black) = (kings[::-1], black, white)
+        squares = kings + [sq for (_, sq) in white] + [sq for (_, sq) in black]
+        return self.probe_squares(material_name(strong, weak), squares, bitboard.color ^ swapped)
+
+    def best_move(self, board):
+        """
+        This method picks the move that keeps the result of a position and mates as fast as possible (or resists as
+        long as possible when the position is lost)
+
+        :param board: (Board) The position
+        :return: (Move, Probe) The move and the result of the position, or None if the position is not covered
+        """
+        root = self.probe(board)
+        if root is None:
+            return None
+
+        best = None
+        for move in board.generate_legal_moves():
+            board.make_move(move)
+            child = self.probe(board)
+            board.unmake_move()
+            if child is None:  # a capture into a material set that has not been generated
+                return None
+
+            rank = (0, child.plies) if child.result < 0 else (1, 0) if child.result == 0 else (2, -child.plies)
+            if best is None or rank < best[0]:
+                best = (rank, move)
+
+        return None if best is None else (best[1], root)
+
+    def close(self):
+        """
+        This method closes all the tables
+
+        :return: None
+        """
+        for table in self.tables.values():
+            if table is not None:
+                table.close()
+        self.tables = {}
+# endregion Tablebases
+
+
+# region generate
+# every worker knows the material set being generated and probes the tables of the captures itself
+worker_material = None
+worker_tablebases = None
+
+
+def init_generator(name, path):
+    """
+    This function prepares a process (a worker of the pool, or the main process without a pool) for a material set
+
+    :param name: (String) The name of the material set
+    :param path: (String) The directory of the tables
+    :return: None
+    """
+    global worker_material, worker_tablebases
+    worker_material = Material(name)
+    worker_tablebases = Tablebases(path)
+
+
+def init_slice(task):
+    """
+    This function looks at every move of a slice of the positions of one side to move. The positions that are mated
+    are found, the moves that stay in the material set are counted (only their distinct targets count, see
+    predecessors) and the captures are probed in the smaller tables.
+
+    :param task: (Integer, Integer, Integer) The color to move, the first index and the index after the last one
+    :return: (Integer, Integer, Bytes, Bytes, Bytes, Bytes, Bytes) The color and the first index, then one byte per
+    position: its value (INVALID, a mate or DRAW), the number of targets in the material set, the longest loss through
+    a capture, whether or not a capture (or a stalemate) saves the draw, and the fastest win through a capture (NONE)
+    """
+    (color, start, end) = task
+    material = worker_material
+    (values, counters, longest, escapes, fastest) = (bytearray(end - start), bytearray(end - start),
+                                                     bytearray(end - start), bytearray(end - start),
+                                                     bytearray([NONE]) * (end - start))
+    for index in range(start, end):
+        squares = material.squares(index)
+        if not is_legal(material, squares, color) or material.index(squares) != index:
+            values[index - start] = INVALID
+            continue
+
+        occupancy = occupancy_of(squares)
+        own = occupancy_of([sq for (piece, sq) in enumerate(squares) if material.colors[piece] == color])
+        (moves, targets) = (0, set())
+        for (piece, sq) in enumerate(squares):
+            if material.colors[piece] != color:
+                continue
+
+            for target in iter_bits(piece_attacks(material.codes[piece], sq, occupancy) & ~own):
+                child = list(squares)
+                child[piece] = target
+                captured = next((other for (other, other_sq) in enumerate(squares) if other_sq == target), None)
+                if captured is not None:
+                    child[captured] = None
+                if is_attacked(material, child, child[color], color ^ 1,
+                               occupancy_of(child) if captured is None else occupancy ^ BITS[sq]):
+                    continue
+
+                moves += 1
+                if captured is None:
+                    targets.add(material.index(child))
+                    continue
+
+                probe = worker_tablebases.probe_squares(*captured_position(material, child, captured, color ^ 1))
+                if probe is None:
+                    raise ValueError("Missing table after a capture in %s" % material.name)
+                if probe.result < 0:
+                    fastest[index - start] = min(fastest[index - start], probe.plies + 1)
+                elif probe.result == 0:
+                    escapes[index - start] = 1
+                else:
+                    longest[index - start] = max(longest[index - start], probe.plies + 1)
+
+        counters[index - start] = len(targets)
+        if moves == 0:
+            if is_attacked(material, squares, squares[color], color ^ 1, occupancy):
+                values[index - start] = encode(0)
+            else:
+                escapes[index - start] = 1  # stalemate
+
+    return color, start, bytes(values), bytes(counters), bytes(longest), bytes(escapes), bytes(fastest)
+
+
+def predecessors(task):
+    """
+    This function takes back the last move of positions: it lists the distinct positions (other player to move) from
+    which a move that stays in the material set leads to each of them
+
+    :param task: (Integer, Bytes) The color to move in the positions and their indexes (array("I") bytes)
+    :return: (Bytes) The indexes of the predecessors (array("I") bytes), repeated once per position they lead to
+    """
+    (color, data) = task
+    material = worker_material
+    mover = color ^ 1
+    result = array("I")
+    for index in array("I", data):
+        squares = material.squares(index)
+        occupancy = occupancy_of(squares)
+        previous = set()
+        for (piece, sq) in enumerate(squares):
+            if material.colors[piece] != mover:
+                continue
+
+            for origin in iter_bits(piece_attacks(material.codes[piece], sq, occupancy) & ~occupancy):
+                parent = list(squares)
+                parent[piece] = origin
+                if not is_attacked(material, parent, parent[color], mover, occupancy ^ BITS[sq] ^ BITS[origin]):
+                    previous.add(material.index(parent))
+
+        previous.discard(None)
+        result.extend(previous)
+    return result.tobytes()
+
+
+def generate(name, path=None, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    This function generates the table of a material set (and first the missing tables of the captures) by retrograde
+    analysis. The positions are resolved by increasing distance to mate: the predecessors of a position lost in n
+    plies are won in n + 1, and a position is lost once all its moves lead to won positions. What is never resolved
+    is a draw. The moves are looked at and taken back in the workers, slice after slice of the indexes.
+
+    :param name: (String) The name of the material set, e.g. "KQvKR"
+    :param path: (String) The directory of the tables (default: common.TABLEBASE_PATH)
+    :param workers: (Integer) The number of processes
+    :param chunk_size: (Integer) The number of positions handed to a worker at once
+    :return: (String) The path of the table
+    """
+    path = common.TABLEBASE_PATH if path is None else path
+    material = Material(name)
+    for capture in material.captures():
+        if not os.path.exists(os.path.join(path, capture + ".dtm")):
+            generate(capture, path, workers, chunk_size)
+
+    os.makedirs(path, exist_ok=True)
+    start_time = time.perf_counter()
+    pool = multiprocessing.Pool(workers, init_generator, (material.name, path)) if workers > 1 else None
+    if pool is None:
+        init_generator(material.name, path)
+    run = pool.imap_unordered if pool is not None else map
+
+    size = material.size
+    values = [bytearray(size), bytearray(size)]
+    counters = [bytearray(size), bytearray(size)]
+    longest = [bytearray(size), bytearray(size)]
+    escapes = [bytearray(size), bytearray(size)]
+    fastest = [bytearray(size), bytearray(size)]
+    tasks = [(color, first, min(first + chunk_size, size)) for color in (WHITE, BLACK)
+             for first in range(0, size, chunk_size)]
+    for (color, first, *slices) in run(init_slice, tasks):
+        last = first + len(slices[0])
+        for (target, data) in zip((values, counters, longest, escapes, fastest), slices):
+            target[color][first:last] = data
+
+    # buckets of positions by number of plies to mate (odd: won, even: lost)
+    buckets = {}
+    done = [bytearray(size), bytearray(size)]
+
+    def push(plies, color, index):
+        buckets.setdefault(plies, ([], []))[color].append(index)
+
+    for color in (WHITE, BLACK):
+        for index in range(size):
+            if values[color][index] == INVALID:
+                continue
+            if values[color][index] == encode(0):
+                push(0, color, index)
+            elif fastest[color][index] != NONE:
+                push(fastest[color][index], color, index)
+            elif not counters[color][index] and not escapes[color][index]:  # every move is a losing capture
+                values[color][index] = encode(longest[color][index])
+                push(longest[color][index], color, index)
+
+    plies = 0
+    while any(key >= plies for key in buckets):
+        for color in (WHITE, BLACK):
+            resolved = array("I")
+            for index in buckets.get(plies, ([], []))[color]:
+                if done[color][index]:
+                    continue
+                if values[color][index] == DRAW:  # a capture win that no faster win overtook
+                    values[color][index] = encode(plies)
+                if values[color][index] == encode(plies):
+                    done[color][index] = 1
+                    resolved.append(index)
+
+            other = color ^ 1
+            tasks = [(color, resolved[first:first + chunk_size].tobytes()) for first in range(0, len(resolved),
+                                                                                              chunk_size)]
+            for data in run(predecessors, tasks):
+                for index in array("I", data):
+                    if values[other][index] != DRAW:
+                        continue
+                    if plies % 2 == 0:  # the move into a lost position wins
+                        values[other][index] = encode(plies + 1)
+                        push(plies + 1, other, index)
+                        continue
+
+                    counters[other][index] -= 1
+                    longest[other][index] = max(longest[other][index], plies + 1)
+                    if not counters[other][index] and not escapes[other][index] and fastest[other][index] == NONE:
+                        values[other][index] = encode(longest[other][index])
+                        push(longest[other][index], other, index)
+
+        buckets.pop(plies, None)
+        plies += 1
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    table_path = os.path.join(path, material.name + ".dtm")
+    with open(table_path + ".tmp", "wb") as file:
+        file.write(HEADER.pack(MAGIC, material.name.encode("ascii"), size))
+        file.write(values[WHITE])
+        file.write(values[BLACK])
+    os.replace(table_path + ".tmp", table_path)
+
+    positions = 2 * size - values[WHITE].count(INVALID) - values[BLACK].count(INVALID)
+    longest_mate = max([decode(value).plies for value in set(values[WHITE]) | set(values[BLACK]) if value != INVALID])
+    common.debug("%s: %d positions, longest mate %d plies, %.1fs" %
+                 (material.name, positions, longest_mate, time.perf_counter() - start_time))
+    return table_path
+# endregion generate
+
+
+# region main
+def main():
+    """
+    This method parses the command line and generates tables
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases by retrograde analysis")
+    parser.add_argument("material", nargs="+", help="material sets, e.g. KQvK KRvK KQvKR")
+    parser.add_argument("--path", default=common.TABLEBASE_PATH,
+                        help="directory of the tables (default: %s)" % common.TABLEBASE_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="positions handed to a worker at once (default: %d)" % DEFAULT_CHUNK_SIZE)
+    arguments = parser.parse_args()
+
+    for name in arguments.material:
+        try:
+            material = Material(name)
+        except ValueError as exception:
+            common.error(str(exception))
+        start = time.perf_counter()
+        path = generate(material.name, arguments.path, arguments.workers, arguments.chunk_size)
+        print("%s: %d bytes in %.1fs" % (path, os.path.getsize(path), time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
+# endregion main
@@ -0,0 +1,121 @@
+"""
+The part of the project that deals with the transposition table: a fixed-size cache of search results keyed by the
+Zobrist key of the positions
+"""
+# region imports
+from array import array
+
+import common
+from board import Move
+# endregion imports
+
+
+# region constants
+EXACT = 1
+LOWER_BOUND = 2
+UPPER_BOUND = 3
+
+ENTRY_SIZE = 16  # bytes: one 64-bit key and one 64-bit packed data word
+
+# layout of the packed data word
+SCORE_OFFSET = 1 << 31
+DEPTH_SHIFT = 32
+BOUND_SHIFT = 40
+AGE_SHIFT = 42
+MOVE_SHIFT = 48
+AGE_MASK = 63
+# endregion constants
+
+
+# region TranspositionTable
+class TranspositionTable(object):
+    def __init__(self, size_mb=None):
+        size_mb = common.HASH_SIZE_MB if size_mb is None else size_mb
+
+        # the number of entries is the largest power of two that fits the budget, so a key is mapped with a mask
+        entries = 1
+        while entries * 2 * ENTRY_SIZE <= size_mb * 1024 * 1024:
+            entries *= 2
+        self.size = entries
+        self.mask = entries - 1
+
+        self.keys = array("Q", bytes(8 * entries))
+        self.data = array("Q", bytes(8 * entries))
+        self.age = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def clear(self):
+        """
+        This method empties the table and resets its counters
+
+        :return: None
+        """
+        self.keys = array("Q", bytes(8 * self.size))
+        self.data = array("Q", bytes(8 * self.size))
+        (self.age, self.hits, self.misses, self.collisions, self.stores) = (0, 0, 0, 0, 0)
+
+    def new_search(self):
+        """
+        This method starts a new search: the entries stored by previous searches become the first to be replaced
+
+        :return: None
+        """
+        self.age = (self.age + 1) & AGE_MASK
+
+    def probe(self, key):
+        """
+        This method looks a position up
+
+        :param key: (Integer) The Zobrist key of the position
+        :return: (Integer, Integer, Integer, Move) The depth, score, bound type and best move (None if there is no
+                 best move), or None if the position is not stored
+        """
+        index = key & self.mask
+        data = self.data[index]
+        if data and self.keys[index] == key:
+            self.hits += 1
+            move = data >> MOVE_SHIFT
+            return (data >> DEPTH_SHIFT & 255, (data & 0xFFFFFFFF) - SCORE_OFFSET, data >> BOUND_SHIFT & 3,
+                    Move.decode(move) if move else None)
+
+        self.misses += 1
+        if data:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """
+        This method stores the result of a search. The entry already in the slot is kept only if it belongs to the
+        current search, describes another position and was searched deeper (depth-preferred, age-based replacement).
+
+        :param key: (Integer) The Zobrist key of the position
+        :param depth: (Integer) The depth of the search
+        :param score: (Integer) The score of the position
+        :param bound: (Integer) EXACT, LOWER_BOUND or UPPER_BOUND
+        :param move: (Move) The best move, or None
+        :return: None
+        """
+        index = key & self.mask
+        data = self.data[index]
+        if data and self.keys[index] != key and data >> AGE_SHIFT & AGE_MASK == self.age and \
+                data >> DEPTH_SHIFT & 255 > depth:
+            return
+
+        self.stores += 1
+        self.keys[index] = key
+        self.data[index] = (score + SCORE_OFFSET) | min(depth, 255) << DEPTH_SHIFT | bound << BOUND_SHIFT | \
+            self.age << AGE_SHIFT | (0 if move is None else move.encode()) << MOVE_SHIFT
+
+    def usage(self):
+        """
+        This method estimates how full the table is, by sampling its first thousand slots
+
+        :return: (Integer) The number of used slots per thousand
+        """
+        sample = min(1000, self.size)
+        return sum(1 for index in range(sample) if self.data[index]) * 1000 // sample
+# endregion TranspositionTable
@@ -0,0 +1,278 @@
+"""
+The part of the project that lets chess GUIs and tournament managers play against the engine, through the Universal
+Chess Interface on stdin and stdout:
+
+    python uci.py
+
+The search runs in the engine's thread, so the loop reading stdin answers "stop" and "isready" at once, even during a
+long search. Only "uci", "isready", "setoption", "ucinewgame", "position", "go", "stop" and "quit" are understood;
+any other command is ignored, as the protocol asks.
+"""
+# region imports
+import sys
+import threading
+
+import common
+from board import Board, START_FEN
+from engine import Engine
+from search import MATE, MAX_PLY
+from transposition import TranspositionTable
+# endregion imports
+
+
+# region constants
+ENGINE_NAME = "Chess-Game-v2"
+ENGINE_AUTHOR = "danalexandru"
+
+MOVES_TO_GO = 30  # moves the remaining time of a clock is shared between when the GUI does not say
+MOVE_OVERHEAD = 0.05  # seconds kept on the clock for the communication with the GUI
+INFINITE_TIME = float("inf")
+
+MAX_HASH_SIZE_MB = 1024
+MAX_WORKERS = 64
+# endregion constants
+
+
+# region UciSession
+def format_score(score):
+    """
+    This function formats a search score the way UCI expects it: in centipawns, or in moves to mate
+
+    :param score: (Integer) The score from the point of view of the player to move
+    :return: (String) The score, e.g. "cp 35" or "mate -2"
+    """
+    if abs(score) >= MATE - MAX_PLY:
+        moves = (MATE - abs(score) + 1) // 2
+        return "mate %d" % (moves if score > 0 else -moves)
+    return "cp %d" % score
+
+
+def time_budget(board, options):
+    """
+    This function decides how long to think about a move from the parameters of a "go" command
+
+    :param board: (Board) The position to search
+    :param options: (Dict{String: String}) The parameters of the command, e.g. {"wtime": "60000", "winc": "1000"}
+    :return: (Float) The seconds of thinking
+    """
+    if "infinite" in options:
+        return INFINITE_TIME
+    if "movetime" in options:
+        return max(int(options["movetime"]) / 1000 - MOVE_OVERHEAD, 0.0)
+
+    side = "w" if board.current_color == "white" else "b"
+    if side + "time" not in options:
+        return INFINITE_TIME if "depth" in options or "nodes" in options else common.ENGINE_TIME_LIMIT
+
+    remaining = int(options[side + "time"]) / 1000
+    increment = int(options.get(side + "inc", 0)) / 1000
+    moves_to_go = int(options.get("movestogo", MOVES_TO_GO))
+    budget = remaining / max(moves_to_go, 1) + increment
+    return max(min(budget, remaining / 2) - MOVE_OVERHEAD, 0.0)
+
+
+class UciSession(object):
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.lock = threading.Lock()  # the engine's thread and the reading loop both write
+
+        self.hash_size_mb = common.HASH_SIZE_MB
+        self.workers = common.ENGINE_WORKERS
+        self.engine = Engine(self.workers)
+        self.board = Board.from_fen(START_FEN)
+
+        self.infinite = False  # "go infinite": the best move waits for "stop", even if the search ends before
+        self.held_move = None
+
+    def send(self, line):
+        """
+        This method writes a line to the GUI
+
+        :param line: (String) The line
+        :return: None
+        """
+        with self.lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self, lines=sys.stdin):
+        """
+        This method handles the commands of the GUI until "quit" or the end of the input
+
+        :param lines: (Iterable[String]) The commands
+        :return: None
+        """
+        for line in lines:
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == "quit":
+                break
+
+            handler = getattr(self, "command_" + tokens[0], None)
+            if handler is None:
+                continue
+            try:
+                handler(tokens[1:])
+            except (ValueError, IndexError, KeyError) as exception:  # a malformed command must not stop the engine
+                self.send("info string %s" % exception)
+
+        self.engine.close()
+
+    def command_uci(self, tokens):
+        """
+        This method identifies the engine and lists its options
+
+        :param tokens: (List[String]) The parameters of the command
+        :return: None
+        """
+        self.send("id name %s" % ENGINE_NAME)
+        self.send("id author %s" % ENGINE_AUTHOR)
+        self.send("option name Hash type spin default %d min 1 max %d" % (common.HASH_SIZE_MB, MAX_HASH_SIZE_MB))
+        self.send("option name Threads type spin default %d min 1 max %d" % (common.ENGINE_WORKERS, MAX_WORKERS))
+        self.send("uciok")
+
+    def command_isready(self, tokens):
+        """
+        This method answers the GUI's synchronization request
+
+        :param tokens: (List[String]) The parameters of the command
+        :return: None
+        """
+        self.send("readyok")
+
+    def command_setoption(self, tokens):
+        """
+        This method changes an option, e.g. "setoption name Hash value 64"
+
+        :param tokens: (List[String]) The parameters of the command
+        :return: None
+        """
+        if "name" not in tokens or "value" not in tokens:
+            raise ValueError("setoption needs a name and a value")
+        name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")]).lower()
+        value = " ".join(tokens[tokens.index("value") + 1:])
+
+        if name == "hash":
+            self.engine.cancel()
+            self.hash_size_mb = min(max(int(value), 1), MAX_HASH_SIZE_MB)
+            self.engine.table = TranspositionTable(self.hash_size_mb)
+        elif name == "threads":
+            self.engine.close()
+            self.workers = min(max(int(value), 1), MAX_WORKERS)
+            self.engine = Engine(self.workers)
+            self.engine.table = TranspositionTable(self.hash_size_mb)
+
+    def command_ucinewgame(self, tokens):
+        """
+        This method forgets everything learned during the previous game
+
+        :param tokens: (List[String]) The parameters of the command
+        :return: None
+        """
+        self.engine.cancel()
+        self.engine.table.clear()
+
+    def command_position(self, tokens):
+        """
+        This method sets up the position to search, e.g. "position startpos moves e2e4 e7e5" or
+        "position fen <fen> moves ..."
+
+        :param tokens: (List[String]) The parameters of the command
+        :return: None
+        """
+        moves = tokens.index("moves") if "moves" in tokens else len(tokens)
+        if tokens and tokens[0] == "startpos":
+            board = Board.from_fen(START_FEN)
+        elif tokens and tokens[0] == "fen":
+            board = Board.from_fen(" ".join(tokens[1:moves]))
+        else:
+            raise ValueError("position needs startpos or fen")
+
+        for text in tokens[moves + 1:]:
+            move = next((move for move in board.generate_legal_moves() if str(move) == text), None)
+            if move is None:
+                raise ValueError("illegal move %s" % text)
+            board.make_move(move)
+
+        self.board = board
+
+    def command_go(self, tokens):
+        """
+        This method starts searching the current position, e.g. "go wtime 60000 btime 60000 winc 1000 binc 1000",
+        "go depth 8", "go nodes 100000", "go movetime 5000" or "go infinite". The best move is sent when the search is
+        over.
+
+        :param tokens: (List[String]) The parameters of the command
+        :return: None
+        """
+        options = {}
+        for (index, token) in enumerate(tokens):
+            if token == "infinite":
+                options[token] = ""
+            elif index + 1 < len(tokens):
+                options[token] = tokens[index + 1]
+
+        max_depth = int(options["depth"]) if "depth" in options else None
+        max_nodes = int(options["nodes"]) if "nodes" in options else None
+        self.engine.cancel()
+        (self.infinite, self.held_move) = ("infinite" in options, None)
+        self.engine.think(self.board, self.send_best_move, time_budget(self.board, options), max_depth,
+                          self.send_info, max_nodes)
+
+    def command_stop(self, tokens):
+        """
+        This method stops the search, which then sends its best move
+
+        :param tokens: (List[String]) The parameters of the command
+        :return: None
+        """
+        self.engine.stop()
+        with self.lock:
+            (self.infinite, move) = (False, self.held_move)
+            self.held_move = None
+        if move is not None:
+            self.send(move)
+
+    def send_info(self, search):
+        """
+        This method reports a finished iteration of the search (called from the engine's thread)
+
+        :param search: (Search) The search
+        :return: None
+        """
+        self.send("info depth %d score %s nodes %d nps %d time %d pv %s" %
+                  (search.depth, format_score(search.best_score), search.nodes, search.nodes_per_second(),
+                   search.elapsed * 1000, str(search.best_move)))
+
+    def send_best_move(self, move, search):
+        """
+        This method reports the result of the search (called from the engine's thread)
+
+        :param move: (Move) The best move, or None if there is no legal move
+        :param search: (Search) The search
+        :return: None
+        """
+        line = "bestmove %s" % ("0000" if move is None else str(move))
+        with self.lock:
+            if self.infinite:
+                self.held_move = line
+                return
+        self.send(line)
+# endregion UciSession
+
+
+# region main
+def main():
+    """
+    This method runs the engine until the GUI quits
+
+    :return: None
+    """
+    common.FLAG_DEBUG = False  # stdout belongs to the protocol
+    UciSession().run()
+
+
+if __name__ == "__main__":
+    main()
+# endregion main